@@ -1,12 +1,22 @@
 """
 A visualization of the Arctic Circle Theorem, idea from:
    https://www.youtube.com/watch?v=Yy7Q8IWNfHM (The ARCTIC CIRCLE THEOREM or Why do physicists play dominoes?)
+
+Click to grow the diamond, "r" to restart.  For an animation without a display,
+`python headless.py aztec_gold aztec_gold.gif 100`.
 """
 import numpy as np
 import pygame
 
+import kernels
+from palette import Colorizer, surface_array
+
+DIM = 800
+
 N, E, S, W = 1, 2, 3, 4
-COLORS = np.array([
+VERTICAL = np.array([[N, N], [S, S]], dtype=np.uint8)  # the two ways of filling a 2x2 block with dominoes
+HORIZONTAL = np.array([[W, E], [W, E]], dtype=np.uint8)
+COLORS = Colorizer([
     [244, 241, 222],
     [224, 122, 95],
     [61, 64, 91],
@@ -34,47 +44,70 @@ def dance(tiles):
     return new_tiles
 
 def fill(tiles):
-    d, _ = tiles.shape
-    half = d // 2
-    offset = half - .5
-
-    for y, x in np.argwhere(tiles == 0):
-        if abs(y - offset) + abs(x - offset) <= half and tiles[y, x] == 0:
-            if round(np.random.random()):
-                tiles[y, x: x + 2] = N
-                tiles[y + 1, x: x + 2] = S
-            else:
-                tiles[y: y + 2, x] = W
-                tiles[y: y + 2, x + 1] = E
-
-def draw(screen, tiles):
-    screen.fill(COLORS[0])
-    surface = pygame.surfarray.make_surface(COLORS[tiles])
-    surface = pygame.transform.scale(surface, (800, 800))
-    screen.blit(surface, (0, 0))
+    """Fill the empty 2x2 blocks of the diamond with dominoes, vertical or horizontal at random."""
+    cells = np.argwhere(tiles == 0)
+    kernels.fill(tiles, cells, np.random.random(len(cells)) > .5, VERTICAL, HORIZONTAL)
+
+def renderer():
+    """
+    A function drawing tiles, scaled to fill a screen.  The tiles are colored into a corner of a canvas that grows
+    with them, so the diamond growing a step doesn't allocate a new surface.
+    """
+    canvas = None
+
+    def render(screen, tiles):
+        nonlocal canvas
+        d, _ = tiles.shape
+        if canvas is None or canvas.get_width() < d:
+            canvas = pygame.Surface((2 * d, 2 * d))
+        tiles_surface = canvas.subsurface((0, 0, d, d))
+        pygame.surfarray.blit_array(tiles_surface, COLORS(tiles))
+        pygame.transform.scale(tiles_surface, (DIM, DIM), screen)
+
+    return render
+
+def draw(screen, tiles, render):
+    render(screen, tiles)
     pygame.display.flip()
 
+def step(tiles):
+    remove_collisions(tiles)
+    tiles = dance(tiles)
+    fill(tiles)
+    return tiles
+
+def frames(number_of_frames):
+    """Yield frames as arrays, the diamond growing by a step each frame."""
+    screen = pygame.Surface((DIM, DIM))
+    render = renderer()
+
+    tiles = np.zeros((2, 2), dtype=np.uint8)
+    fill(tiles)
+    for _ in range(number_of_frames):
+        render(screen, tiles)
+        yield surface_array(screen)
+        tiles = step(tiles)
+
 def main():
     pygame.init()
-    screen = pygame.display.set_mode((800, 800))
+    screen = pygame.display.set_mode((DIM, DIM))
+    render = renderer()
 
     tiles = np.zeros((2, 2), dtype=np.uint8)
     fill(tiles)
-    draw(screen, tiles)
+    draw(screen, tiles, render)
 
     while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 return
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                remove_collisions(tiles)
-                tiles = dance(tiles)
-                fill(tiles)
-                draw(screen, tiles)
+                tiles = step(tiles)
+                draw(screen, tiles, render)
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
                 tiles = np.zeros((2, 2), dtype=np.uint8)
                 fill(tiles)
-                draw(screen, tiles)
+                draw(screen, tiles, render)
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,8 @@
-from random import choice
 import numpy as np
 import matplotlib.pyplot as plt
 
+from kernels import orbit
+
 PHI = (1 + 5**.5) / 2
 
 
@@ -15,24 +16,17 @@ def make_base(n=3):
 
 
 def chaos_game(*, force_new_corner=False, niter=10000, base_points=3, ratio=.5):
-    previous = None
-    xs, ys = [], []
-    base = make_base(base_points)
-    point = np.array([1, 1])
-
-    for _ in range(niter):
-        if force_new_corner:
-            while True:
-                corner = choice(base)
-                if corner != previous:
-                    break
-            previous = corner
-        else:
-            corner = choice(base)
-
-        point = x, y = point - (point - corner) * ratio
-        xs.append(x)
-        ys.append(y)
+    base = np.array(make_base(base_points))
+
+    if force_new_corner:
+        # Each corner is a random other one than the last: an offset of 1 to base_points - 1 from it.
+        offsets = np.random.randint(1, base_points, niter)
+        offsets[0] = np.random.randint(base_points)
+        corners = np.cumsum(offsets) % base_points
+    else:
+        corners = np.random.randint(base_points, size=niter)
+
+    xs, ys = orbit(np.array([1., 1.]), base[corners], ratio).T
 
     plt.scatter(xs, ys, s=1)
     plt.show()
@@ -1,8 +1,16 @@
-"""Rotate and reflect polygons with `*` and `~`!"""
+"""
+Rotate and reflect polygons with `*` and `~`!
+
+`Ngon`s rebuild their vertices on every operation; `Dihedral` keeps only a (rotation, reflection) pair so operations are
+O(1) and vertices are materialized on demand.
+"""
 
 from collections import deque
+from functools import lru_cache
 import numpy as np
 
+from kernels import walk_segments
+
 τ = 2 * np.pi  # tau
 
 one =   ['   ',
@@ -63,6 +71,66 @@ class Ngon(tuple):
         return type(self)(new_vertices)
 
 
+class Dihedral:
+    """
+    Ngon as a dihedral group element acting on a fixed `base` ngon: the vertex at position i is
+    `base[reflection * (i - rotation)]` with `reflection` either 1 or -1. `*` and `~` only update these two numbers,
+    vertices are built on demand with `vertices`.
+
+    Multiplying by another `Dihedral` applies its transformation: reflect if its `reflection` is -1, then rotate by its
+    `rotation`.
+    """
+    __slots__ = 'base', 'rotation', 'reflection'
+
+    def __init__(self, n, rotation=0, reflection=1):
+        self.base = n if isinstance(n, Ngon) else Ngon(n)
+        self.rotation = rotation % len(self.base)
+        self.reflection = reflection
+
+    @property
+    def vertices(self):
+        n = len(self.base)
+        return type(self.base)(self.base[self.reflection * (i - self.rotation) % n] for i in range(n))
+
+    def __repr__(self):
+        return repr(self.vertices)
+
+    def __mul__(self, other):
+        if isinstance(other, Dihedral):
+            rotation, reflection = other.rotation, other.reflection
+        else:
+            rotation, reflection = other, 1
+        return Dihedral(self.base, rotation + reflection * self.rotation, reflection * self.reflection)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __invert__(self):
+        return Dihedral(self.base, -self.rotation, -self.reflection)
+
+    def __eq__(self, other):
+        if isinstance(other, Dihedral) and self.base == other.base:
+            return (self.rotation, self.reflection) == (other.rotation, other.reflection)
+        return self.vertices == other
+
+    def __hash__(self):
+        return hash(self.vertices)
+
+    def reduce(self, rotations, reflections):
+        """
+        Apply a whole sequence of transformations at once: the j-th reflects if `reflections[j]` then rotates by
+        `rotations[j]`. Equivalent to multiplying by each in turn, but done as a single vectorized reduction.
+        """
+        rotations = np.asarray(rotations, dtype=np.int64) % len(self.base)
+        signs = np.where(reflections, -1, 1).astype(np.int64)
+
+        # The j-th rotation gets negated by every later reflection.
+        later = np.append(np.cumprod(signs[::-1])[::-1][1:], 1)
+        reflection = int(np.prod(signs))
+        rotation = int(reflection * self.rotation + (rotations * later).sum())
+        return Dihedral(self.base, rotation, reflection * self.reflection)
+
+
 class NgonVis(Ngon):
     """Same as Ngon, but with ascii art polygons."""
     def __repr__(self):
@@ -73,52 +141,68 @@ class NgonPrinter:
     r = 12  # radius of our ngon
 
     @staticmethod
-    def _set_points(n):
+    def _set_points(n, r):
         """Returns the points of a ngon; points2 is just points shifted by 1"""
-        r = NgonPrinter.r
-        points = [(.95 * r * np.cos(τ * i / n), .95 * r * np.sin(τ * i / n)) for i in range(n)]
-        points2 = points[1:] + [points[0]]
-        return points, points2
+        theta = τ * np.arange(n) / n
+        points = .95 * r * np.stack((np.cos(theta), np.sin(theta)), axis=1)
+        return points, np.roll(points, -1, axis=0)
 
-    @classmethod
-    def _line_segment(cls, x1, y1, x2, y2, grid, value='*'):
-        """Draw a line segment from (x1, y1) to (x2, y2)."""
+    @staticmethod
+    def _segments(points, points2, r):
+        """
+        Grid cells the segments from each of `points` to each of `points2` start and end at, distances along them
+        between grid lines of each axis and their steps along each axis (the arguments of `kernels.walk_segments`).
+        """
         # first we int-ify segment coordinates and make sure (0, 0) is center of our grid
-        x1, y1, x2, y2 = (int(i) - cls.r for i in (x1, -y1, x2, -y2))
+        # (coordinates flipped because numpy indexing)
+        start = np.stack((-points[:, 1], points[:, 0]), axis=1).astype(int) - r
+        end = np.stack((-points2[:, 1], points2[:, 0]), axis=1).astype(int) - r
 
-        angle = np.arctan2(y2 - y1, x2 - x1)              # angle of segment
-        angle = np.array([np.sin(angle), np.cos(angle)])  # convert angle to a vector
+        dy, dx = (end - start).T
+        angle = np.arctan2(dy, dx)                                # angle of segments
+        angle = np.stack((np.sin(angle), np.cos(angle)), axis=1)  # convert angles to vectors
 
         with np.errstate(divide="ignore"):
             delta = abs(1 / angle)
 
-        step = np.sign(angle)
-        grid_dis = np.where(step > 0, delta, 0)    # distance to next grid point if step is positive else 0
+        step = np.sign(angle).astype(int)
+        # `2 * r + 2` grid lines of each axis are more than any segment needs.
+        return start, end, delta, step, 2 * r + 2
+
+    @classmethod
+    def _line_segments(cls, points, points2, r):
+        """Grid cells on the line segments from each of `points` to each of `points2`, all segments at once."""
+        return walk_segments(*cls._segments(points, points2, r))
 
-        # We'll start at map_pos and iteratively step to closest grid point and mark it with a '*' until we're close
-        # enough to the end of the segment.
-        map_pos = np.array([y1, x1])  # flipped coordinates because numpy indexing
-        while True:
-            grid[tuple(map_pos)] = value  # mark current location
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _outline(cls, n, r):
+        """Grid with the outline of a ngon drawn in and positions of its vertex labels."""
+        grid = np.full((r * 2 + 1, ) * 2, ' ')
+        points, points2 = cls._set_points(n, r)
 
-            if np.linalg.norm(map_pos - (y2, x2)) <= 1:  # if distance to end of segment <= 1
-                break
+        ys, xs = cls._line_segments(points, points2, r).T
+        grid[ys, xs] = '*'
 
-            side = int(grid_dis[0] > grid_dis[1])  # which integer coordinate is closest to us?
-            grid_dis[side] += delta[side]          # increment that coordinate by delta
-            map_pos[side] += step[side]            # step to that coordinate
+        labels = (.5 * points + r).astype(int)  # .5 to move the numbers a bit closer to the origin
+        grid.flags.writeable = labels.flags.writeable = False
+        return grid, labels
 
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _glyph(vertex):
+        """Translate vertex number into an ascii art array of characters."""
+        glyph = np.array(list(zip(*map(translate.get, vertex)))).reshape(3, -1)
+        glyph.flags.writeable = False
+        return glyph
 
     @classmethod
     def show(cls, ngon):
-        grid = np.full((cls.r * 2 + 1, ) * 2, ' ')
-
-        for p1, p2, vertex in zip(*cls._set_points(len(ngon)), ngon):
-            cls._line_segment(*p1, *p2, grid)
+        grid, labels = cls._outline(len(ngon), cls.r)
+        grid = grid.copy()
 
-            # translate vertex number into an ascii art array of characters
-            vertex = np.array(list(zip(*map(translate.get, str(vertex))))).reshape(3, -1)
-            x, y = (.5 * np.array(p1) + cls.r).astype(int)  # .5 to move the numbers a bit closer to the origin
-            grid[y: y + vertex.shape[0], x: x + vertex.shape[1]] = vertex  # paste the digit into our grid
+        for (x, y), vertex in zip(labels, ngon):
+            glyph = cls._glyph(str(vertex))
+            grid[y: y + glyph.shape[0], x: x + glyph.shape[1]] = glyph  # paste the digit into our grid
 
         return '\n'.join(' '.join(row) for row in grid)
@@ -7,6 +7,8 @@ import time
 import numpy as np
 import scipy.ndimage as nd
 
+from palette import Text
+
 # This kernel counts the live neighbors
 KERNEL = np.array([[1, 1, 1],
                    [1, 0, 1],
@@ -15,6 +17,7 @@ KERNEL = np.array([[1, 1, 1],
 DIM = os.get_terminal_size()[::-1]
 
 universe = np.random.randint(2, size=DIM, dtype=np.uint8)
+text = Text(" █", DIM)
 
 # We initialize these arrays so we can perform all operations in place.
 convolved_universe = np.zeros_like(universe)
@@ -25,7 +28,7 @@ intermediate_3 = np.zeros_like(universe)
 while True:
     for _ in range(1000):
         os.system("clear || cls")  # Clears the terminal
-        print(*("".join("█" if cell else " " for cell in row) for row in universe), sep="\n")
+        print(text(universe))
         nd.convolve(universe, KERNEL, mode="constant", output=convolved_universe)
         # It isn't pretty, but doing the following logic in place:
         # (((universe == 1) & (convolved_universe > 1) & (convolved_universe < 4)) |
@@ -1,21 +1,51 @@
 """
 Game of life, but newly born cells are the average color of their parents.
 
-Press "r" to reset the universe, click to draw.
+Press "r" to reset the universe, click to draw.  For an animation without a display,
+`python headless.py game_of_life_averages life.gif`.
 """
 import numpy as np
 import scipy.ndimage as nd
 import pygame
 
+from palette import pack_channels, surface_array
+
 KERNEL = np.array([[1, 1, 1],
                    [1, 0, 1],
                    [1, 1, 1]], dtype=np.uint8)
 DIM = 500, 500
-window = pygame.display.set_mode(DIM)
 
-def main():
+def new_universe():
     universe = np.random.randint(2, size=DIM)
     RGB = [np.where(universe, np.random.randint(256, size=DIM), 0) for _ in range(3)]
+    return universe, RGB
+
+def step(universe, RGB):
+    neighbors = nd.convolve(universe, KERNEL, mode="constant")
+
+    still_alive = universe & (neighbors > 1) & (neighbors < 4)
+    new_borns = ~universe & (neighbors == 3)
+    universe = still_alive + new_borns
+
+    old_colors = [np.where(still_alive, color, 0) for color in RGB]
+    new_colors = [np.where(new_borns, nd.convolve(color, KERNEL, mode="constant") / 3, 0) for color in RGB]
+
+    return universe, [sum(color) for color in zip(old_colors, new_colors)]
+
+def frames(number_of_frames):
+    """Yield frames as arrays, a generation per frame."""
+    surface = pygame.Surface(DIM)
+    pixels = np.empty((*DIM, 3), dtype=np.uint8)
+    universe, RGB = new_universe()
+    for _ in range(number_of_frames):
+        universe, RGB = step(universe, RGB)
+        pygame.surfarray.blit_array(surface, pack_channels(RGB, pixels))
+        yield surface_array(surface)
+
+def main():
+    window = pygame.display.set_mode(DIM)
+    pixels = np.empty((*DIM, 3), dtype=np.uint8)
+    universe, RGB = new_universe()
     MOUSEDOWN = False
 
     while True:
@@ -24,8 +54,7 @@ def main():
                 return
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_r:
                 # Reset
-                universe = np.random.randint(2, size=DIM)
-                RGB = [np.where(universe, np.random.randint(256, size=DIM), 0) for _ in range(3)]
+                universe, RGB = new_universe()
             elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 MOUSEDOWN = True
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
@@ -40,20 +69,12 @@ def main():
                 color[poke] = np.random.randint(256)
 
         # Update state
-        neighbors = nd.convolve(universe, KERNEL, mode="constant")
-
-        still_alive = universe & (neighbors > 1) & (neighbors < 4)
-        new_borns = ~universe & (neighbors == 3)
-        universe = still_alive + new_borns
-
-        old_colors = [np.where(still_alive, color, 0) for color in RGB]
-        new_colors = [np.where(new_borns, nd.convolve(color, KERNEL, mode="constant") / 3, 0) for color in RGB]
-
-        RGB = [sum(color) for color in zip(old_colors, new_colors)]
+        universe, RGB = step(universe, RGB)
 
-        pygame.surfarray.blit_array(window, np.dstack(RGB))
+        pygame.surfarray.blit_array(window, pack_channels(RGB, pixels))
         pygame.display.update()
 
-pygame.init()
-main()
-pygame.quit()
+if __name__ == "__main__":
+    pygame.init()
+    main()
+    pygame.quit()
@@ -0,0 +1,99 @@
+"""
+Render the pygame demos without a display and save them as PNG sequences or GIFs.
+
+Each demo has a `frames` generator yielding its frames as (height, width, 3) uint8 arrays.  `write_frames` encodes them
+as they're produced: the demo runs on a producer thread while the calling thread encodes, so simulating and encoding
+overlap.  Demos with an `FPS` run in real time, and their `frames` take the frame rate to step the simulation by.
+
+Usage:
+    python headless.py pendulums pendulums.gif [number_of_frames]
+    python headless.py aztec_gold 'aztec/{:04}.png' 100
+
+A path with a `{}` field is a PNG sequence, one file per frame.
+"""
+import os
+import sys
+from importlib import import_module
+from queue import Queue
+from threading import Thread
+
+import imageio
+
+DEMOS = 'pendulums', 'modular_multiplication_on_circle', 'aztec_gold', 'game_of_life_averages'
+FPS = 30
+QUEUE_SIZE = 16  # frames buffered between the producer and the encoder
+MIN_GIF_DELAY = 20  # ms; browsers play GIF frames with shorter delays at 100 ms
+_DONE = object()
+
+
+def use_dummy_video():
+    """SDL's dummy video driver: pygame renders to surfaces without a display.  Call before `pygame.init`."""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+
+def _produce(frames, queue):
+    try:
+        for frame in frames:
+            queue.put(frame)
+    except BaseException as error:
+        queue.put(error)
+    else:
+        queue.put(_DONE)
+
+
+def frame_rate(path, fps=FPS):
+    """The frame rate `write_frames` writes `path` at: `fps`, but at most 1000 / MIN_GIF_DELAY for a GIF."""
+    return min(fps, 1000 / MIN_GIF_DELAY) if path.lower().endswith('.gif') else fps
+
+
+def write_frames(frames, path, fps=FPS, queue_size=QUEUE_SIZE):
+    """
+    Encode `frames` to `path`: a GIF (or anything else imageio can write as a sequence), or a PNG sequence if `path` has
+    a `{}` field for the frame number.  Frames are played at `frame_rate(path, fps)`, with up to `queue_size` of them
+    waiting to be encoded.  Returns the number of frames written.
+    """
+    fps = frame_rate(path, fps)
+    queue = Queue(maxsize=queue_size)
+    producer = Thread(target=_produce, args=(frames, queue), daemon=True)
+    producer.start()
+
+    if '{' in path:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        writer = None
+    else:
+        writer = imageio.get_writer(path, mode='I', duration=1000 / fps, loop=0)
+
+    written = 0
+    try:
+        while (frame := queue.get()) is not _DONE:
+            if isinstance(frame, BaseException):
+                raise frame
+            if writer is None:
+                imageio.imwrite(path.format(written), frame)
+            else:
+                writer.append_data(frame)
+            written += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    producer.join()
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in DEMOS:
+        sys.exit(f"usage: python headless.py {{{','.join(DEMOS)}}} path [number_of_frames]")
+
+    use_dummy_video()
+    demo = import_module(sys.argv[1])
+    number_of_frames = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    path = sys.argv[2]
+    if hasattr(demo, 'FPS'):
+        fps = frame_rate(path, demo.FPS)
+        frames = demo.frames(number_of_frames, fps=fps)
+    else:
+        fps, frames = FPS, demo.frames(number_of_frames)
+    write_frames(frames, path, fps)
@@ -0,0 +1,228 @@
+"""
+Compiled kernels for the loops NumPy can't vectorize cleanly, with NumPy fallbacks.
+
+Each kernel is a plain loop over arrays.  If numba is importable the loop is compiled with `numba.njit(cache=True)`;
+compiled code is cached on disk (in __pycache__, or under NUMBA_CACHE_DIR to share one cache between checkouts), so
+only the first run pays for compilation.  Without numba, or with TINY_MATH_NO_JIT set, the kernel is instead its
+reference: an equivalent implementation in NumPy.
+
+Randomness is drawn by the callers and passed in, so a kernel and its reference agree given the same arguments;
+`python kernels.py` checks that they do (comparing the uncompiled loops when numba is missing).
+"""
+import os
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+JIT = numba is not None and not os.environ.get('TINY_MATH_NO_JIT')
+KERNELS = {}  # name: (loop, kernel, reference)
+BLOCK = 64  # steps of the chaos game orbit computed at once by its reference
+
+
+def kernel(reference):
+    """Decorator compiling a loop into a kernel, or replacing it with `reference` if it can't be compiled."""
+    def decorator(loop):
+        compiled = numba.njit(cache=True, nogil=True)(loop) if JIT else reference
+        KERNELS[loop.__name__] = loop, compiled, reference
+        return compiled
+    return decorator
+
+
+def _orbit(point, corners, ratio):
+    """
+    Points moving `ratio` of the way to each of the corners in turn: `point - (point - corner) * ratio`.  The orbit is
+    linear in the corners, so a block of it is a matrix product with the powers of `1 - ratio`.
+    """
+    decay = 1 - ratio
+    lag = np.subtract.outer(np.arange(BLOCK), np.arange(BLOCK))
+    transfer = np.where(lag >= 0, decay ** np.maximum(lag, 0), 0)
+    powers = decay ** np.arange(1, BLOCK + 1)
+
+    points = np.empty(corners.shape)
+    point = np.asarray(point, dtype=float)
+    for start in range(0, len(corners), BLOCK):
+        block = corners[start:start + BLOCK] * ratio
+        n = len(block)
+        points[start:start + n] = transfer[:n, :n] @ block + powers[:n, None] * point
+        point = points[start + n - 1]
+    return points
+
+
+@kernel(_orbit)
+def orbit(point, corners, ratio):
+    points = np.empty(corners.shape)
+    x, y = point[0], point[1]
+    for i in range(len(corners)):
+        x = x - (x - corners[i, 0]) * ratio
+        y = y - (y - corners[i, 1]) * ratio
+        points[i, 0] = x
+        points[i, 1] = y
+    return points
+
+
+def _walk_segments(start, end, delta, step, n_steps):
+    """
+    Grid cells on segments from `start` to `end`, given the distances `delta` along each segment between grid lines of
+    each axis and the `step` (-1, 0 or 1) along each axis.
+
+    Each segment is walked one grid cell at a time, always stepping along whichever axis has the closest grid line
+    (preferring rows on ties), until we're within distance 1 of the end of the segment, over at most `n_steps` grid
+    lines of each axis. The distances along the segment to successive grid lines of each axis are cumulative sums, so
+    merging them with a stable sort gives the order of the steps.
+    """
+    grid_dis = np.where(step > 0, delta, 0)  # distance to next grid point if step is positive else 0
+
+    # Distances to the first `n_steps` grid lines of each axis, rows then columns.
+    distances = np.repeat(delta[:, :, None], n_steps, axis=2)
+    distances[:, :, 0] = grid_dis
+    distances = distances.cumsum(axis=2).reshape(len(start), -1)
+
+    side = np.argsort(distances, axis=1, kind="stable") // n_steps  # which axis each step moves along
+    moves = np.where(side[:, :, None], [0, 1], [1, 0]) * step[:, None]
+
+    cells = np.concatenate((start[:, None], start[:, None] + moves.cumsum(axis=1)), axis=1)
+    done = ((cells - end[:, None])**2).sum(axis=2) <= 1  # distance to end of segment <= 1
+    keep = np.arange(cells.shape[1]) <= done.argmax(axis=1)[:, None]
+    return cells[keep]
+
+
+@kernel(_walk_segments)
+def walk_segments(start, end, delta, step, n_steps):
+    cells = np.empty((len(start) * (2 * n_steps + 1), 2), dtype=start.dtype)
+    count = 0
+    for i in range(len(start)):
+        y, x = start[i, 0], start[i, 1]
+        row_distance = delta[i, 0] if step[i, 0] > 0 else 0.0
+        column_distance = delta[i, 1] if step[i, 1] > 0 else 0.0
+        rows = columns = 0
+
+        first = count
+        cells[count, 0], cells[count, 1] = y, x
+        count += 1
+        last = -1  # cells past the first within distance 1 of the end are dropped; with none, all but the first are
+        if (y - end[i, 0])**2 + (x - end[i, 1])**2 <= 1:
+            last = first
+        for _ in range(2 * n_steps):
+            if columns == n_steps or rows < n_steps and row_distance <= column_distance:
+                y += step[i, 0]
+                row_distance += delta[i, 0]
+                rows += 1
+            else:
+                x += step[i, 1]
+                column_distance += delta[i, 1]
+                columns += 1
+            if last == -1:
+                cells[count, 0], cells[count, 1] = y, x
+                count += 1
+                if (y - end[i, 0])**2 + (x - end[i, 1])**2 <= 1:
+                    last = count - 1
+        count = last + 1 if last != -1 else first + 1
+    return cells[:count]
+
+
+def _fill(tiles, cells, coins, vertical, horizontal):
+    """
+    Fill the empty 2x2 blocks of an aztec diamond with a pair of dominoes each: the 2x2 tiles `vertical` where `coins`
+    (one per cell of `cells`, the empty cells in row-major order) is true, else `horizontal`.
+    """
+    d, _ = tiles.shape
+    half = d // 2
+    offset = half - .5
+
+    for (y, x), coin in zip(cells.tolist(), coins.tolist()):
+        if abs(y - offset) + abs(x - offset) <= half and tiles[y, x] == 0:
+            tiles[y: y + 2, x: x + 2] = vertical if coin else horizontal
+
+
+@kernel(_fill)
+def fill(tiles, cells, coins, vertical, horizontal):
+    half = tiles.shape[0] // 2
+    offset = half - .5
+
+    for i in range(len(cells)):
+        y, x = cells[i, 0], cells[i, 1]
+        if abs(y - offset) + abs(x - offset) <= half and tiles[y, x] == 0:
+            tiles[y: y + 2, x: x + 2] = vertical if coins[i] else horizontal
+
+
+def _escape_counts(C, z, iterations, bailout):
+    """
+    Escape counts of the points `C` (flat) iterating `Z**2 + C` from `z`, 0 for points that don't escape in
+    `iterations`: only the points yet to escape are iterated.
+    """
+    Z = np.full(C.shape, z)
+    escapes = np.zeros(C.shape, dtype=np.uint16)
+
+    alive = np.arange(C.size)
+    for i in range(1, iterations):
+        if not alive.size:
+            break
+        Z = Z**2 + C
+        escaped = np.abs(Z) > bailout
+        escapes[alive[escaped]] = i
+
+        remaining = ~escaped
+        Z, C, alive = Z[remaining], C[remaining], alive[remaining]
+    return escapes
+
+
+@kernel(_escape_counts)
+def escape_counts(C, z, iterations, bailout):
+    escapes = np.zeros(C.shape, dtype=np.uint16)
+    for j in range(len(C)):
+        Z, c = z, C[j]
+        for i in range(1, iterations):
+            Z = Z * Z + c
+            if abs(Z) > bailout:
+                escapes[j] = i
+                break
+    return escapes
+
+
+def _cases():
+    """Arguments to check each kernel with, and functions of the kernel's results to compare."""
+    import aztec_gold
+    import dihedral
+
+    rng = np.random.default_rng(0)
+    returned = lambda first, result: result
+
+    yield 'orbit', (np.array([1., 1.]), rng.choice(np.array([[0, 1], [.87, -.5], [-.87, -.5]]), 10**4), .5), returned
+    for n in range(1, 12):
+        yield 'walk_segments', dihedral.NgonPrinter._segments(*dihedral.NgonPrinter._set_points(n, 12), 12), returned
+
+    tiles = np.zeros((2, 2), dtype=np.uint8)
+    for _ in range(30):
+        cells = np.argwhere(tiles == 0)
+        arguments = tiles, cells, rng.random(len(cells)) > .5, aztec_gold.VERTICAL, aztec_gold.HORIZONTAL
+        yield 'fill', arguments, lambda tiles, result: tiles  # filled in place
+        _fill(*arguments)
+        aztec_gold.remove_collisions(tiles)
+        tiles = aztec_gold.dance(tiles)
+    points = rng.uniform(-2, 2, 10**4) + 1j * rng.uniform(-2, 2, 10**4)
+    yield 'escape_counts', (points, .3 - .1j, 48, 2.), returned
+
+
+def check():
+    """Check each kernel against its reference (without numba, the uncompiled loops) on the same arguments."""
+    for name, arguments, compared in _cases():
+        loop, compiled, reference = KERNELS[name]
+        results = []
+        for function in (compiled if JIT else loop, reference):
+            # Kernels may work in place, so each gets its own copies
+            copies = [argument.copy() if isinstance(argument, np.ndarray) else argument for argument in arguments]
+            results.append(compared(copies[0], function(*copies)))
+
+        # The orbit's reference sums in a different order
+        same = np.allclose(*results) if name == 'orbit' else np.array_equal(*results)
+        if not same:
+            raise AssertionError(f"{name} differs from its reference")
+    print(f"kernels match their references ({'compiled' if JIT else 'uncompiled loops'})")
+
+
+if __name__ == "__main__":
+    check()
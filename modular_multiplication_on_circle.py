@@ -1,16 +1,35 @@
 """
 Pygame implementation of https://www.youtube.com/watch?v=qhbuKbxJsk8
 
-Use up/down to change number of points and left/right to change the multiplication factor
+Use up/down to change number of points and left/right to change the multiplication factor.  For an animation without a
+display, `python headless.py modular_multiplication_on_circle modular.gif`.
+
+For high resolution renders of the envelopes (cardioid at factor 2, nephroid at 3, ...), chord coverage is accumulated
+into a float density buffer and tone-mapped, with frames of a sweep of factors rendered in parallel:
+    python modular_multiplication_on_circle.py sweep 'envelopes/{:04}.png' [first_factor last_factor frames]
+
+Circles of fewer than DIRECT_POINTS points have their chords drawn by pygame.  With more, chords overlap enough that
+they're rasterized with NumPy instead: every chord is accumulated, antialiased, into a coverage buffer at once, which is
+then blended from BACKCOLOR to FORECOLOR.  The last few rendered circles are cached by (points, factor), so a frame
+where neither changed is a single blit.
 """
-from collections import defaultdict
+from collections import defaultdict, deque
+from functools import lru_cache
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pygame
 
+from palette import surface_array
+
 #Modify these as you will
 DIM = 800
 FORECOLOR = 193, 169, 13
 BACKCOLOR = 17, 107, 156
+FACTOR_DELTA = .1  # change of the factor per frame while left/right is held, and per frame of an animation
+CACHE_SIZE = 4  # rendered circles kept: while a key is held every frame is a new circle, so only unchanged ones hit
+DIRECT_POINTS = 1000  # circles with fewer points have their chords drawn by pygame
 
 #But Leave these alone
 DIM_ARRAY = np.array([DIM, DIM])
@@ -19,48 +38,186 @@ RADIUS = DIM / 2 - 10
 BLACK = 0, 0, 0
 NUMBER_OF_POINTS = 40
 FACTOR = 10
+DOT_RADIUS = 4
+MAX_SAMPLES = 2**22  # line samples rasterized at once
+
+# Density renders
+RESOLUTION = 3840, 2160  # width, height
+DENSITY_POINTS = 5000
+WHITE_POINT = 200  # density mapped to full FORECOLOR; densities are tone-mapped logarithmically up to it
+GAMMA = 1 / 2.2
+
+def coordinates(points, number_of_points, radius=RADIUS, center=CENTER):
+    """(x, y) of each of `points` (an array) on a circle of `number_of_points` points, one row per point."""
+    theta = np.asarray(points) * (2 * np.pi / number_of_points)
+    return radius * np.stack((np.sin(theta), np.cos(theta)), axis=-1) + center
+
+def chords(number_of_points, factor, radius=RADIUS, center=CENTER):
+    """Start and end points of every chord, point -> factor * point."""
+    points = np.arange(number_of_points)
+    starts = coordinates(points, number_of_points, radius, center)
+    return starts, coordinates(factor * points, number_of_points, radius, center)
+
+def accumulate_lines(density, starts, ends):
+    """
+    Add antialiased lines from `starts` to `ends` ((n, 2) arrays of x, y) into `density`, a float (height, width)
+    buffer, so that each pixel gains about the length of line passing through it.  Lines are sampled about once per
+    pixel and each sample is split bilinearly between the four pixels around it.
+    """
+    height, width = density.shape
+    flat = density.reshape(-1)
+
+    lengths = np.hypot(*(ends - starts).T)
+    samples = np.ceil(lengths).astype(np.intp) + 1
+    # Batches of lines with at most MAX_SAMPLES samples between them (but at least one line each)
+    bounds = np.searchsorted(np.cumsum(samples), np.arange(MAX_SAMPLES, samples.sum(), MAX_SAMPLES), side='right')
+    for batch in np.split(np.arange(len(starts)), np.unique(bounds)):
+        if not len(batch):
+            continue
+
+        counts = samples[batch]
+        line = np.repeat(batch, counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        t = (np.arange(counts.sum()) - first) / np.repeat(np.maximum(counts - 1, 1), counts)
+
+        x, y = (starts[line] + (ends - starts)[line] * t[:, None]).T
+        weight = np.repeat(lengths[batch] / counts, counts)
+
+        x0, y0 = np.floor(x), np.floor(y)
+        fx, fy = x - x0, y - y0
+        x0, y0 = x0.astype(np.intp), y0.astype(np.intp)
+        # The four pixels around each sample, accumulated in a single pass over the buffer
+        xs = np.concatenate((x0, x0 + 1, x0, x0 + 1))
+        ys = np.concatenate((y0, y0, y0 + 1, y0 + 1))
+        shares = np.concatenate(((1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy))
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        flat += np.bincount(
+            (ys * width + xs)[inside], weights=(np.tile(weight, 4) * shares)[inside], minlength=flat.size
+        )
+    return density
+
+def blend(coverage, foreground=FORECOLOR, background=BACKCOLOR):
+    """(height, width, 3) uint8 image going from `background` to `foreground` as coverage goes from 0 to 1."""
+    background = np.array(background, dtype=float)
+    image = np.clip(coverage, 0, 1)[..., None] * (np.array(foreground) - background) + background
+    return image.astype(np.uint8)
 
-keys = defaultdict(bool)
+def density(number_of_points, factor, resolution=RESOLUTION):
+    """Chord density of a circle filling the height of a (height, width) buffer."""
+    width, height = resolution
+    buffer = np.zeros((height, width))
+    if number_of_points:
+        accumulate_lines(buffer, *chords(number_of_points, factor, height / 2 - 10, np.array([width, height]) / 2))
+    return buffer
 
-pygame.init()
+def tone_map(density, white_point=WHITE_POINT, gamma=GAMMA):
+    """Map densities, in place, to coverages in [0, 1]: logarithmically, so both single chords and envelopes show."""
+    np.log1p(density, out=density)
+    density /= np.log1p(white_point)
+    np.clip(density, 0, 1, out=density)
+    density **= gamma
+    return density
 
-window = pygame.display.set_mode(DIM_ARRAY)
-font = pygame.font.Font(pygame.font.get_default_font(), 20)
-running = True
+def render_density(factor, number_of_points=DENSITY_POINTS, resolution=RESOLUTION):
+    """Tone-mapped (height, width, 3) uint8 image of the chords of a circle, with a black background."""
+    return blend(tone_map(density(number_of_points, factor, resolution)), background=BLACK)
 
-def coordinates(point):
-    theta = point * 2 * np.pi / NUMBER_OF_POINTS
-    return RADIUS * np.array([np.sin(theta), np.cos(theta)]) + CENTER
+def _rendered(executor, factors, number_of_points, resolution, in_flight):
+    """Frames of `factors` in order, rendering at most `in_flight` at a time, so finished frames don't pile up."""
+    pending = deque()
+    for factor in factors:
+        if len(pending) == in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(render_density, factor, number_of_points, resolution))
+    while pending:
+        yield pending.popleft().result()
 
-while running:
+def sweep(path, factors, number_of_points=DENSITY_POINTS, resolution=RESOLUTION, processes=None):
+    """Render a frame for each of `factors` on `processes` processes, written to `path` in order as they finish."""
+    from headless import write_frames
 
-    window.fill(BACKCOLOR)
-    for point in range(NUMBER_OF_POINTS):
-        pygame.draw.aaline(window, FORECOLOR, coordinates(point), coordinates(FACTOR * point), 1)
-    #Separate loop so lines don't draw on top of circles
-    for point in range(NUMBER_OF_POINTS):
-        pygame.draw.circle(window, BLACK, coordinates(point).astype(int), 4, 4)
+    processes = processes or os.cpu_count()
+    with ProcessPoolExecutor(processes) as executor:
+        frames = _rendered(executor, factors, number_of_points, resolution, 2 * processes)
+        return write_frames(frames, path, queue_size=processes)
+
+@lru_cache(maxsize=1)
+def dot():
+    surface = pygame.Surface((2 * DOT_RADIUS, 2 * DOT_RADIUS), pygame.SRCALPHA)
+    pygame.draw.circle(surface, BLACK, (DOT_RADIUS, DOT_RADIUS), DOT_RADIUS)
+    return surface
+
+@lru_cache(maxsize=CACHE_SIZE)
+def render(number_of_points, factor):
+    """Surface with the chords and points of a circle."""
+    if number_of_points < DIRECT_POINTS:
+        surface = pygame.Surface(DIM_ARRAY)
+        surface.fill(BACKCOLOR)
+        starts, ends = chords(number_of_points, factor)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            pygame.draw.aaline(surface, FORECOLOR, start, end)
+    else:
+        coverage = np.zeros((DIM, DIM))
+        accumulate_lines(coverage, *chords(number_of_points, factor))
+        surface = pygame.surfarray.make_surface(blend(coverage).swapaxes(0, 1))
+    #Points are drawn after the chords so chords don't draw on top of them
+    if number_of_points:
+        corners = (coordinates(np.arange(number_of_points), number_of_points) - DOT_RADIUS).astype(int)
+        surface.blits([(dot(), corner) for corner in corners.tolist()], doreturn=False)
+    return surface
+
+def draw(surface, font, number_of_points, factor):
+    factor = round(factor, 6)  # so repeatedly stepped factors hit the cache
+    surface.blit(render(number_of_points, factor), (0, 0))
     text_surfaces = [font.render(text, True, FORECOLOR)
-                     for text in [f'Points: {NUMBER_OF_POINTS}', f'Factor: {round(FACTOR, 1)}']]
-    window.blit(text_surfaces[0], dest=(10, 10))
-    window.blit(text_surfaces[1], dest=(10, 30))
-    pygame.display.update()
-
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            keys[event.key] = True
-        elif event.type == pygame.KEYUP:
-            keys[event.key] = False
-
-    if keys[pygame.K_UP]:
-        NUMBER_OF_POINTS += 1
-    if keys[pygame.K_DOWN]:
-        NUMBER_OF_POINTS -= 1 if NUMBER_OF_POINTS else 0
-    if keys[pygame.K_LEFT]:
-        FACTOR -= .1
-    if keys[pygame.K_RIGHT]:
-        FACTOR += .1
-
-pygame.quit()
+                     for text in [f'Points: {number_of_points}', f'Factor: {round(factor, 1)}']]
+    surface.blit(text_surfaces[0], dest=(10, 10))
+    surface.blit(text_surfaces[1], dest=(10, 30))
+
+def frames(number_of_frames, number_of_points=NUMBER_OF_POINTS, factor=FACTOR):
+    """Yield frames as arrays, the factor growing by FACTOR_DELTA each frame."""
+    pygame.font.init()
+    font = pygame.font.Font(pygame.font.get_default_font(), 20)
+    surface = pygame.Surface(DIM_ARRAY)
+
+    for frame in range(number_of_frames):
+        draw(surface, font, number_of_points, factor + frame * FACTOR_DELTA)
+        yield surface_array(surface)
+
+def main():
+    number_of_points, factor = NUMBER_OF_POINTS, FACTOR
+    keys = defaultdict(bool)
+
+    pygame.init()
+
+    window = pygame.display.set_mode(DIM_ARRAY)
+    font = pygame.font.Font(pygame.font.get_default_font(), 20)
+
+    while True:
+        draw(window, font, number_of_points, factor)
+        pygame.display.update()
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+            elif event.type == pygame.KEYDOWN:
+                keys[event.key] = True
+            elif event.type == pygame.KEYUP:
+                keys[event.key] = False
+
+        if keys[pygame.K_UP]:
+            number_of_points += 1
+        if keys[pygame.K_DOWN]:
+            number_of_points -= 1 if number_of_points else 0
+        if keys[pygame.K_LEFT]:
+            factor -= FACTOR_DELTA
+        if keys[pygame.K_RIGHT]:
+            factor += FACTOR_DELTA
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['sweep']:
+        first, last, number_of_frames = map(float, sys.argv[3:6]) if len(sys.argv) > 5 else (2, 10, 480)
+        sweep(sys.argv[2], np.linspace(first, last, int(number_of_frames)).tolist())
+    else:
+        main()
+        pygame.quit()
@@ -1,5 +1,18 @@
+"""
+Mandelbrot and Julia sets with numpy.
+
+Besides integer escape counts, `julia` can return continuous escape counts, which color without bands, and estimated
+distances to the set, which shade its boundary; both come out of the same loop as the escape counts.
+`adaptive_julia` computes the escape counts iterating only near the boundaries of regions of equal escape count.
+
+`python numpy_mandelbrot.py` writes mandelbrot.gif, `python numpy_mandelbrot.py check` checks `adaptive_julia`.
+"""
+import sys
+
 import numpy as np
-import imageio
+
+import kernels
+from palette import lut, smooth_palette
 
 LEFT, RIGHT = -2.0, 1.0
 BOTTOM, TOP = -1.5, 1.5
@@ -11,31 +24,188 @@ xs = np.linspace(LEFT, RIGHT, WIDTH)
 ys = np.linspace(TOP, BOTTOM, HEIGHT)
 xs, ys = np.meshgrid(xs, ys)
 GRID = xs + ys * 1j
+PIXEL = (RIGHT - LEFT) / (WIDTH - 1)
+BAILOUT = 2
+MIN_SIZE = 16  # rectangles of `adaptive_julia` this narrow are iterated rather than split
+
+def julia(z=0, smooth=False, distance=False):
+    """
+    The default, z=0, is the Mandelbrot set.  Returns the escape count of every point, 0 for points that never escape.
+
+    With `smooth` and/or `distance` returns a tuple of the escape counts and, in that order, continuous escape counts
+    (about count - 1 to count for each escape count) and estimates of the distance to the set (the set is within a
+    quarter of the estimate and the estimate); both are 0 for points that never escape.
+    """
+    if not (smooth or distance):
+        return escape_counts(GRID, z)
 
-def julia(z=0):
-    """The default, z=0, is the Mandelbrot set."""
     Z = np.full(GRID.shape, z)
     C = GRID - z
     escapes = np.zeros(C.shape, dtype=np.uint16)
+    if smooth:
+        counts = np.zeros(C.shape)
+    if distance:
+        # Derivative of Z with respect to C
+        dZ = np.zeros(C.shape, dtype=complex)
+        distances = np.zeros(C.shape)
 
     for i in range(1, ITERATIONS):
+        if distance:
+            dZ = np.where(escapes, 0, 2 * Z * dZ + 1)
         Z = np.where(escapes, 0, Z**2 + C)
-        escapes[np.abs(Z) > 2] = i
+        escaped = np.abs(Z) > BAILOUT  # Only points escaping this iteration: escaped points are reset to 0
+        escapes[escaped] = i
+
+        if (smooth or distance) and escaped.any():
+            modulus = np.abs(Z[escaped])
+            log_modulus = np.log(modulus)
+            if smooth:
+                counts[escaped] = i - np.log2(log_modulus / np.log(BAILOUT))
+            if distance:
+                distances[escaped] = 2 * modulus * log_modulus / np.abs(dZ[escaped])
+
+    return (escapes, *([counts] if smooth else []), *([distances] if distance else []))
+
+def escape_counts(C, z=0):
+    """
+    Escape counts of the points `C` (any shape, indexes of GRID say), iterating from `z` as `julia` does, but only the
+    points yet to escape (see `kernels.escape_counts`).
+    """
+    C = np.asarray(C - z, dtype=complex)
+    return kernels.escape_counts(C.reshape(-1), complex(z), ITERATIONS, float(BAILOUT)).reshape(C.shape)
+
+def _border(top, left, bottom, right):
+    """Row and column indexes of the border of a rectangle, corners inclusive."""
+    rows = np.arange(top, bottom + 1)
+    columns = np.arange(left + 1, right)
+    return (
+        np.concatenate((rows, rows, np.full(columns.size, top), np.full(columns.size, bottom))),
+        np.concatenate((np.full(rows.size, left), np.full(rows.size, right), columns, columns)),
+    )
+
+def adaptive_julia(z=0, min_size=MIN_SIZE):
+    """
+    Escape counts identical to `julia(z)`, computed by Mariani-Silver subdivision: a rectangle whose border escapes
+    uniformly is filled without iterating its interior, otherwise it's split in four.  Rectangles narrower than
+    `min_size` have their interiors iterated outright.  The borders of every rectangle of a level are iterated at once.
+    Also returns the number of points iterated.
 
-    return escapes
+    Subdivision relies on anything escaping inside a rectangle being connected to its border, but a filament thinner
+    than a pixel can slip between the points of a border, leaving specks that escape inside it; so the ring just inside
+    a uniform border has to be uniform too before the rest is filled.  `python numpy_mandelbrot.py check` compares the
+    two along the spiral.
+    """
+    escapes = np.zeros(GRID.shape, dtype=np.uint16)
+    known = np.zeros(GRID.shape, dtype=bool)
+    iterated = 0
+
+    def compute(rows, columns):
+        nonlocal iterated
+        unknown = ~known[rows, columns]
+        rows, columns = rows[unknown], columns[unknown]
+        escapes[rows, columns] = escape_counts(GRID[rows, columns], z)
+        known[rows, columns] = True
+        iterated += rows.size
+
+    rectangles = [(0, 0, HEIGHT - 1, WIDTH - 1)]
+    while rectangles:
+        borders = [_border(*rectangle) for rectangle in rectangles]
+        compute(*map(np.concatenate, zip(*borders)))
+
+        # Rectangles with uniform borders, and their rings just inside the border
+        uniform = [
+            (top, left, bottom, right) for (top, left, bottom, right), (rows, columns) in zip(rectangles, borders)
+            if bottom - top > 2 and right - left > 2 and (escapes[rows, columns] == escapes[top, left]).all()
+        ]
+        rings = [_border(top + 1, left + 1, bottom - 1, right - 1) for top, left, bottom, right in uniform]
+        if rings:
+            compute(*map(np.concatenate, zip(*rings)))
+        filled = set()
+        for (top, left, bottom, right), (rows, columns) in zip(uniform, rings):
+            if (escapes[rows, columns] == escapes[top, left]).all():
+                interior = slice(top + 2, bottom - 1), slice(left + 2, right - 1)
+                escapes[interior] = escapes[top, left]
+                known[interior] = True
+                filled.add((top, left, bottom, right))
+
+        split, interiors = [], []
+        for top, left, bottom, right in rectangles:
+            if (top, left, bottom, right) in filled or bottom - top < 2 or right - left < 2:
+                continue
+            if bottom - top <= min_size or right - left <= min_size:
+                interiors.append(np.mgrid[top + 1:bottom, left + 1:right].reshape(2, -1))
+            else:
+                middle_row, middle_column = (top + bottom) // 2, (left + right) // 2
+                split += [
+                    (top, left, middle_row, middle_column), (top, middle_column, middle_row, right),
+                    (middle_row, left, bottom, middle_column), (middle_row, middle_column, bottom, right),
+                ]
+
+        if interiors:
+            compute(*np.concatenate(interiors, axis=1))
+        rectangles = split
+
+    return escapes, iterated
 
 # Palette
 R = [66, 25,  9,  4,   0,  12,  24,  57, 134, 211, 241, 248, 255, 204, 153, 106, 0]
 G = [30,  7,  1,  4,   7,  44,  82, 125, 181, 236, 233, 201, 170, 128,  87,  52, 0]
 B = [15, 26, 47, 73, 100, 138, 177, 209, 229, 248, 191,  95,   0,   0,   0,   3, 0]
-RGB = np.stack((R, G, B), axis=1)
+RGB = lut(np.stack((R, G, B), axis=1))
+# Color of each escape count: the 16 colors cycle, with the last, black, for points that never escaped
+ESCAPE_COLORS = np.vstack((RGB[-1:], RGB[np.arange(1, ITERATIONS) % 16]))
 
-def color(array):
-    array = np.where(array, array % 16, -1)
-    return RGB[array].astype(np.uint8)
+def color(array, out=None):
+    """Colors of escape counts, written into `out` (a (height, width, 3) uint8 array) if given."""
+    return np.take(ESCAPE_COLORS, array, axis=0, out=out, mode='clip')
+
+# Smooth colors: the palette, interpolated, in SHADES shades fading from white at the boundary, then black for the
+# interior
+PALETTE_SIZE = 256
+SHADES = 16
+BOUNDARY = 2  # pixels within this distance of the set are lighter the closer they are, so thin filaments show
+PALETTE = smooth_palette(RGB[:16], PALETTE_SIZE)
+SHADED = PALETTE + np.linspace(1, 0, SHADES)[:, None, None] * (255 - PALETTE.astype(float))
+SMOOTH_COLORS = lut(np.vstack((np.rint(SHADED).reshape(-1, 3), RGB[-1:])))
+
+def smooth_color(escapes, counts, distances, out=None):
+    """
+    Colors of continuous escape counts, the palette cycling every 16, lightened by distance near the set (see `julia`),
+    written into `out` if given.
+    """
+    hues = np.multiply(counts, PALETTE_SIZE / 16, out=np.empty(counts.shape, dtype=np.intp), casting='unsafe')
+    hues %= PALETTE_SIZE
+    shades = np.multiply(np.minimum(distances / (BOUNDARY * PIXEL), 1), SHADES - 1, out=np.empty_like(hues),
+                         casting='unsafe')
+    indices = shades
+    indices *= PALETTE_SIZE
+    indices += hues
+    indices[escapes == 0] = len(SMOOTH_COLORS) - 1
+    return np.take(SMOOTH_COLORS, indices, axis=0, out=out)
 
 def spiral(theta):
     return np.e**(.1 * -theta) * (np.sin(theta) + np.cos(theta) * 1j)
 
-frames = [color(julia(spiral(theta))) for theta in np.linspace(0, 4 * np.pi, 100)]
-imageio.mimsave('mandelbrot.gif', frames, duration=.05)
\ No newline at end of file
+def frames(number_of_frames=100):
+    """Yield frames of Julia sets along a spiral as arrays."""
+    for theta in np.linspace(0, 4 * np.pi, number_of_frames):
+        yield smooth_color(*julia(spiral(theta), smooth=True, distance=True))
+
+def check(number_of_frames=100):
+    """Check `adaptive_julia` against `julia` along the spiral, and report the fraction of the points it iterates."""
+    iterated = 0
+    for theta in np.linspace(0, 4 * np.pi, number_of_frames):
+        escapes, points = adaptive_julia(spiral(theta))
+        # The smooth counts come from iterating every point of the grid
+        if not np.array_equal(escapes, julia(spiral(theta), smooth=True)[0]):
+            raise AssertionError(f"adaptive_julia differs from julia at theta={theta}")
+        iterated += points
+    print(f'identical; iterated {iterated / (number_of_frames * GRID.size):.1%} of the points')
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['check']:
+        check()
+    else:
+        from headless import write_frames
+
+        write_frames(frames(), 'mandelbrot.gif', fps=20)
@@ -0,0 +1,156 @@
+"""
+Palettes and colorization shared by the renderers.
+
+Colors are looked up in precomputed tables with `np.take(..., out=)` into buffers allocated once, so colorizing a frame
+allocates nothing.  Frames are (height, width, 3) uint8 arrays, which imageio writes as they are; `to_surface` blits
+them into a pygame surface through a transposed view rather than a copy, and `surface_array` copies one out of a
+surface.
+
+`python palette.py` compares the per-frame allocations of the old mappings with the lookup tables.
+"""
+import tracemalloc
+from time import perf_counter
+
+import numpy as np
+import pygame
+
+
+def lut(colors):
+    """A lookup table of colors, one (r, g, b) row per index."""
+    return np.ascontiguousarray(colors, dtype=np.uint8)
+
+
+def smooth_palette(colors, size):
+    """`size` colors going smoothly (linearly) around a cycle through `colors`, for continuous values."""
+    colors = np.asarray(colors, dtype=float)
+    positions = np.linspace(0, len(colors), size, endpoint=False)
+    below = positions.astype(int)
+    fraction = (positions - below)[:, None]
+    return lut(np.rint(colors[below] * (1 - fraction) + colors[(below + 1) % len(colors)] * fraction))
+
+
+class Colorizer:
+    """
+    Colors arrays of palette indices through a lookup table.  Output frames cycle through `buffers` preallocated
+    arrays, so a frame stays valid until `buffers - 1` more have been colored (e.g. while it waits to be encoded).
+    Buffers only grow, so frames of changing sizes are colored without allocating either once the largest has been seen.
+    """
+    def __init__(self, table, buffers=1):
+        self.table = lut(table)
+        self._storage = [np.empty(0, dtype=np.uint8) for _ in range(buffers)]
+        self._indices = np.empty(0, dtype=np.intp)
+        self._next = 0
+
+    def _frame(self, shape):
+        size = np.prod(shape, dtype=int)
+        if self._storage[0].size < 3 * size:
+            # Grown geometrically, so a frame growing a little each time reallocates rarely
+            capacity = max(3 * size, 2 * self._storage[0].size)
+            self._storage = [np.empty(capacity, dtype=np.uint8) for _ in self._storage]
+            self._indices = np.empty(capacity // 3, dtype=np.intp)
+        storage = self._storage[self._next]
+        self._next = (self._next + 1) % len(self._storage)
+        # A prefix of the storage, so the frame is contiguous, as np.take needs to write into it directly
+        return storage[:3 * size].reshape(*shape, 3)
+
+    def __call__(self, indices, mode='clip'):
+        """Colors of integer `indices`; `mode` is np.take's: 'clip' or 'wrap' out of range indices."""
+        frame = self._frame(indices.shape)
+        if indices.dtype != np.intp:
+            # np.take would convert them to a new array
+            np.copyto(self._indices[:indices.size].reshape(indices.shape), indices)
+            indices = self._indices[:indices.size].reshape(indices.shape)
+        return np.take(self.table, indices, axis=0, out=frame, mode=mode)
+
+    def smooth(self, values, scale=1, mode='wrap'):
+        """Colors of continuous `values`, `scale` palette entries per unit."""
+        frame = self._frame(values.shape)
+        indices = self._indices[:values.size].reshape(values.shape)
+        np.multiply(values, scale, out=indices, casting='unsafe')
+        return np.take(self.table, indices, axis=0, out=frame, mode=mode)
+
+
+class Text:
+    """Renders (rows, columns) arrays of indices as lines of `characters`, through buffers allocated once."""
+    def __init__(self, characters, shape):
+        rows, columns = shape
+        self.table = np.array([ord(character) for character in characters + '\n'], dtype='<u4')
+        # The last column indexes the newline
+        self._indices = np.full((rows, columns + 1), len(characters), dtype=np.intp)
+        self._codes = np.empty((rows, columns + 1), dtype='<u4')
+
+    def __call__(self, indices):
+        np.copyto(self._indices[:, :-1], indices)
+        np.take(self.table, self._indices, out=self._codes, mode='clip')
+        return self._codes.reshape(-1)[:-1].tobytes().decode('utf-32-le')
+
+
+def pack_channels(channels, out):
+    """Write separate r, g, b arrays into the (..., 3) uint8 array `out`."""
+    for i, channel in enumerate(channels):
+        np.copyto(out[..., i], channel, casting='unsafe')
+    return out
+
+
+def surface_array(surface):
+    """A copy of a surface's pixels as a (height, width, 3) uint8 array."""
+    return np.ascontiguousarray(pygame.surfarray.pixels3d(surface).swapaxes(0, 1))
+
+
+def to_surface(frame, surface):
+    """Blit a (height, width, 3) frame into a surface of its size (pygame indexes surfaces by x first)."""
+    pygame.surfarray.blit_array(surface, frame.swapaxes(0, 1))
+    return surface
+
+
+def benchmark(frames=20):
+    """Peak bytes allocated per frame by the old, allocating, mappings and by lookup tables."""
+    rng = np.random.default_rng(0)
+    escapes = rng.integers(0, 48, size=(1024, 1024), dtype=np.uint16)
+    tiles = rng.integers(0, 5, size=(1024, 1024), dtype=np.uint8)
+    channels = [rng.integers(0, 256, size=(1024, 1024)) for _ in range(3)]
+    cells = rng.integers(0, 2, size=(64, 256), dtype=np.uint8)
+    # The old mapping's `np.where(escapes, ..., -1)` needs signed escapes (NumPy 2 wraps -1 around for uint16)
+    signed_escapes = escapes.astype(np.intp)
+
+    palette = lut(np.arange(17 * 3).reshape(17, 3))
+    escape_table = np.vstack((palette[-1:], palette[np.arange(1, 48) % 16]))
+    tile_table = palette[:5]
+
+    escape_colors, tile_colors, text = Colorizer(escape_table), Colorizer(tile_table), Text(' █', cells.shape)
+    rgb = np.empty((1024, 1024, 3), dtype=np.uint8)
+
+    cases = {
+        'mandelbrot': (
+            lambda: palette[np.where(signed_escapes, signed_escapes % 16, -1)].astype(np.uint8),
+            lambda: escape_colors(escapes),
+        ),
+        'aztec gold': (lambda: palette[tiles], lambda: tile_colors(tiles)),
+        'life averages': (lambda: np.dstack(channels).astype(np.uint8), lambda: pack_channels(channels, rgb)),
+        'life text': (
+            lambda: '\n'.join(''.join('█' if cell else ' ' for cell in row) for row in cells),
+            lambda: text(cells),
+        ),
+    }
+
+    frame_bytes = rgb.nbytes
+    print(f'per frame, {frame_bytes:,} byte frames:')
+    for name, (before, after) in cases.items():
+        for label, colorize in (('before', before), ('after', after)):
+            colorize()  # first call allocates the lookup buffers
+            tracemalloc.start()
+            start = perf_counter()
+            for _ in range(frames):
+                tracemalloc.reset_peak()
+                colorize()
+            elapsed = (perf_counter() - start) / frames
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f'{name:>14} {label:>6}: {peak:>12,} bytes peak ({peak / frame_bytes:.1f} frames), '
+                f'{elapsed * 1e3:.2f} ms'
+            )
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,52 +1,217 @@
+"""
+Pendulum "waves": pendulums of different lengths drift in and out of phase.
+
+The pendulums are integrated from the exact equation of motion, theta'' = -g / r sin(theta), rather than the
+small-angle approximation, which is off for large amplitudes.
+
+Run with no arguments to watch them, or headless:
+    python pendulums.py record trajectories.npy [steps]  -- angles of every pendulum at every step, as a memory-mapped
+                                                           .npy file (read it back with `np.load(..., mmap_mode='r')`)
+    python pendulums.py benchmark                        -- pendulum-steps per second of each integration method
+    python headless.py pendulums pendulums.gif           -- the animation, see `headless`
+"""
+import sys
+from time import perf_counter
+
 import numpy as np
 import pygame
 
+from palette import surface_array
+
 #Modify these as you will
 DIM = 800
 FORECOLOR = 193, 169, 13
 BACKCOLOR = 17, 107, 156
 MAX_RADIUS = 60
 NUMBER_OF_PENDULUMS = 20
-pendulums = [MAX_RADIUS - n for n in range(NUMBER_OF_PENDULUMS)]
 START_ANGLE = np.pi / 4
-TIME_DELTA = np.pi / 200
+TIME_DELTA = np.pi / 200  # simulation time per physics step
+STEPS_PER_SECOND = 60  # physics steps per second of real time, independent of the frame rate
+FPS = 60
+BOB_RADIUS = 10
+METHOD = 'leapfrog'  # or 'rk4'
 
 #But Leave these alone
 DIM_ARRAY = np.array([DIM, DIM])
 CENTER = DIM_ARRAY / 2
 BLACK = 0, 0, 0
+GRAVITY = 9.8
+RADII = MAX_RADIUS - np.arange(NUMBER_OF_PENDULUMS)
+LENGTHS = DIM / (2 * MAX_RADIUS) * RADII
+
+
+class Pendulums:
+    """
+    Any number of pendulums stepped together, in place, over preallocated state arrays.  `method` is 'leapfrog'
+    (velocity Verlet: symplectic, so energy doesn't drift) or 'rk4' (classic fourth order Runge-Kutta).
+    """
+    def __init__(self, radii, angle=START_ANGLE, method=METHOD):
+        if method not in ('leapfrog', 'rk4'):
+            raise ValueError(f"Unknown method {method!r}.")
+
+        self.method = method
+        self._neg_k = -GRAVITY / np.asarray(radii, dtype=float)
+        n = len(self._neg_k)
+
+        self.time = 0
+        self.theta = np.full(n, angle, dtype=float)
+        self.omega = np.zeros(n)
+
+        self._acc = np.empty(n)
+        self._theta, self._omega = np.empty(n), np.empty(n)
+        self._sum_theta, self._sum_omega = np.empty(n), np.empty(n)
+        self._acceleration(self.theta, self._acc)
+
+    def _acceleration(self, theta, out):
+        np.sin(theta, out=out)
+        np.multiply(out, self._neg_k, out=out)
+
+    def _leapfrog(self, dt):
+        theta, omega, acc, half_kick = self.theta, self.omega, self._acc, self._omega
+
+        np.multiply(acc, dt / 2, out=half_kick)
+        omega += half_kick
+        np.multiply(omega, dt, out=self._theta)
+        theta += self._theta
+        self._acceleration(theta, acc)
+        np.multiply(acc, dt / 2, out=half_kick)
+        omega += half_kick
+
+    def _rk4(self, dt):
+        theta, omega, acc = self.theta, self.omega, self._acc
+        stage_theta, stage_omega = self._theta, self._omega
+        sum_theta, sum_omega = self._sum_theta, self._sum_omega
+
+        # k1 = (omega, acc): acc is always up to date with theta.
+        np.copyto(sum_theta, omega)
+        np.copyto(sum_omega, acc)
+        velocity = omega
+        for weight, fraction in ((2, .5), (2, .5), (1, 1)):
+            # Each stage is at state + fraction * dt * (the previous stage's derivatives).
+            np.multiply(velocity, fraction * dt, out=stage_theta)
+            stage_theta += theta
+            np.multiply(acc, fraction * dt, out=stage_omega)
+            stage_omega += omega
+            self._acceleration(stage_theta, acc)
+            velocity = stage_omega
+
+            np.multiply(stage_omega, weight, out=stage_theta)
+            sum_theta += stage_theta
+            np.multiply(acc, weight, out=stage_theta)
+            sum_omega += stage_theta
+
+        sum_theta *= dt / 6
+        theta += sum_theta
+        sum_omega *= dt / 6
+        omega += sum_omega
+        self._acceleration(theta, acc)
+
+    def step(self, dt=TIME_DELTA, steps=1):
+        advance = self._leapfrog if self.method == 'leapfrog' else self._rk4
+        for _ in range(steps):
+            advance(dt)
+        self.time += steps * dt
+
+    def energy(self):
+        """Energy of each pendulum per unit mass and squared length; constant for the exact motion."""
+        return self.omega**2 / 2 + self._neg_k * np.cos(self.theta)
+
+    def record(self, path, steps, dt=TIME_DELTA):
+        """Step `steps` times, recording the angles before each step and after the last to a memory-mapped .npy file."""
+        trajectory = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(steps + 1, len(self.theta)))
+        for i in range(steps):
+            trajectory[i] = self.theta
+            self.step(dt)
+        trajectory[steps] = self.theta
+        trajectory.flush()
+        return trajectory
+
+
+def coordinates(theta, out):
+    """Positions of the bobs with angles `theta`, written into `out`."""
+    np.sin(theta, out=out[:, 0])
+    np.cos(theta, out=out[:, 1])
+    out *= LENGTHS[:, None]
+    out += CENTER
+    return out
+
+
+def benchmark(n=10**5, steps=200):
+    for method in ('leapfrog', 'rk4'):
+        pendulums = Pendulums(np.linspace(1, MAX_RADIUS, n), method=method)
+        start = perf_counter()
+        pendulums.step(steps=steps)
+        elapsed = perf_counter() - start
+        print(f'{method}: {n * steps / elapsed:,.0f} pendulum-steps/sec')
+
+
+def renderer():
+    """A function drawing pendulums with angles `theta` on a surface, drawing through buffers allocated once."""
+    # The bob is rendered once and blitted for every pendulum.
+    bob = pygame.Surface((2 * BOB_RADIUS, 2 * BOB_RADIUS), pygame.SRCALPHA)
+    pygame.draw.circle(bob, BLACK, (BOB_RADIUS, BOB_RADIUS), BOB_RADIUS)
+
+    positions = np.empty((NUMBER_OF_PENDULUMS, 2))
+    corners = np.empty((NUMBER_OF_PENDULUMS, 2), dtype=int)
+    # Each line goes out to a bob and back to the center, so all of them are a single polyline.
+    polyline = np.tile(CENTER, (2 * NUMBER_OF_PENDULUMS + 1, 1))
+
+    def draw(surface, theta):
+        coordinates(theta, positions)
+        polyline[1::2] = positions
+        np.subtract(positions, BOB_RADIUS, out=corners, casting='unsafe')
+
+        surface.fill(BACKCOLOR)
+        pygame.draw.aalines(surface, FORECOLOR, False, polyline)
+        #Bobs are drawn after the lines so lines don't draw on top of them
+        surface.blits([(bob, corner) for corner in corners.tolist()], doreturn=False)
+
+    return draw
+
+
+def frames(number_of_frames, fps=FPS):
+    """Yield frames of the animation as arrays, with as many physics steps per frame as in real time."""
+    surface = pygame.Surface(DIM_ARRAY)
+    draw = renderer()
+    pendulums = Pendulums(RADII)
+
+    lag = 0
+    for _ in range(number_of_frames):
+        draw(surface, pendulums.theta)
+        yield surface_array(surface)
 
-pygame.init()
+        steps, lag = divmod(lag + STEPS_PER_SECOND / fps, 1)
+        pendulums.step(steps=int(steps))
 
-window = pygame.display.set_mode(DIM_ARRAY)
 
-def coordinates(time, radius):
-    theta = START_ANGLE * np.cos((9.8 / radius)**.5 * time)
-    return DIM/(2 * MAX_RADIUS) * radius * np.array([np.sin(theta), np.cos(theta)]) + CENTER
+def main():
+    pygame.init()
 
-time = 0
-running = True
-while running:
+    window = pygame.display.set_mode(DIM_ARRAY)
+    draw = renderer()
+    pendulums = Pendulums(RADII)
 
-    window.fill(BACKCOLOR)
-    for pendulum in pendulums:
-        pygame.draw.aaline(window, FORECOLOR, coordinates(time, pendulum), CENTER, 1)
-    #Separate loop so lines don't draw on top of circles
-    for pendulum in pendulums:
-        # for i in range(1,5):
-        #     trans = pygame.Surface((15,15))
-        #     trans.fill(BACKCOLOR)
-        #     trans.set_alpha(255/4 * i)
-        #     pygame.draw.circle(trans, BLACK, (7,7), 10, 10)
-        #     window.blit(trans, coordinates(time - (4 - i), pendulum).astype(int))
-        pygame.draw.circle(window, BLACK, coordinates(time, pendulum).astype(int), 10, 10)
+    clock = pygame.time.Clock()
+    step = 1 / STEPS_PER_SECOND
+    lag = 0
+    while True:
+        lag += clock.tick(FPS) / 1000
+        steps, lag = divmod(lag, step)
+        pendulums.step(steps=int(steps))
 
-    pygame.display.update()
+        draw(window, pendulums.theta)
+        pygame.display.update()
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
 
-    time += TIME_DELTA
 
-pygame.quit()
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['record']:
+        Pendulums(RADII).record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 10**4)
+    elif sys.argv[1:2] == ['benchmark']:
+        benchmark()
+    else:
+        main()
+        pygame.quit()
@@ -11,15 +11,64 @@ Example:
 
     >>> q * p
     Permutation(1, 2, 3, 0, 4)
+
+    >>> (p * q).cycles()
+    [(0, 3, 1, 2)]
+
+    >>> (p * q).order(), (p * q).sign()
+    (4, -1)
+
+    >>> (p * q)**3 == (p * q).inverse()
+    True
+
+Permutations are backed by integer arrays, so composition, inversion and powers are all O(n) regardless of the
+exponent.
+
+Groups of permutations are built from generators with the Schreier-Sims algorithm:
+    >>> G = PermutationGroup(Permutation(1, 2, 3, 4, 0), Permutation(1, 0, 2, 3, 4))
+
+    >>> G.order()
+    120
+
+    >>> Permutation(0, 2, 1, 3, 4) in G
+    True
+
+    >>> PermutationGroup(Permutation(1, 2, 0, 3, 4), Permutation(0, 1, 2, 4, 3)).order()
+    6
+
+Batches of permutations are 2D arrays with one permutation per row; `compose`, `PermutationGroup.contains` and
+`PermutationGroup.random` work on whole batches at once.
 """
+from math import lcm
+
+import numpy as np
 
 
 class Permutation:
     def __init__(self, *seq):
-        if not all(i in seq for i in range(len(seq))):
+        if not all(isinstance(i, (int, np.integer)) for i in seq):
             raise ValueError("Not a proper permutation.")
+
+        seq = np.array(seq, dtype=np.intp)
+        n = len(seq)
+
+        if n and (seq.min() < 0 or seq.max() >= n):
+            raise ValueError("Not a proper permutation.")
+
+        seen = np.zeros(n, dtype=bool)
+        seen[seq] = True
+        if not seen.all():
+            raise ValueError("Not a proper permutation.")
+
         self.seq = seq
 
+    @classmethod
+    def _from_array(cls, seq):
+        """Wrap an array already known to be a permutation, skipping validation."""
+        perm = cls.__new__(cls)
+        perm.seq = seq
+        return perm
+
     def __mul__(self, other):
         if not isinstance(other, Permutation):
             raise TypeError("Not a permutation.")
@@ -27,10 +76,255 @@ class Permutation:
         if not len(other) == len(self):
             raise ValueError("Length mismatch.")
 
-        return Permutation(*(self.seq[i] for i in other.seq))
+        return self._from_array(self.seq[other.seq])
+
+    def __pow__(self, k):
+        flat, offsets, lengths = self._cycle_structure()
+        starts = np.repeat(offsets, lengths)
+        sizes = np.repeat(lengths, lengths)
+        # Reduce the exponent per cycle length with Python ints, so huge exponents never reach int64 arithmetic.
+        shifts = np.repeat(np.array([k % length for length in lengths.tolist()], dtype=np.intp), lengths)
+
+        seq = np.empty_like(self.seq)
+        seq[flat] = flat[starts + (np.arange(len(flat)) - starts + shifts) % sizes]
+        return self._from_array(seq)
+
+    def inverse(self):
+        seq = np.empty_like(self.seq)
+        seq[self.seq] = np.arange(len(self.seq))
+        return self._from_array(seq)
+
+    def _cycle_structure(self):
+        """
+        All cycles (fixed points included) concatenated into one array, along with the offset and length of each cycle
+        in that array.
+        """
+        seq = self.seq.tolist()
+        seen = bytearray(len(seq))
+        flat, offsets, lengths = [], [], []
+
+        for start in range(len(seq)):
+            if seen[start]:
+                continue
+
+            offsets.append(len(flat))
+            i = start
+            while not seen[i]:
+                seen[i] = 1
+                flat.append(i)
+                i = seq[i]
+            lengths.append(len(flat) - offsets[-1])
+
+        return np.array(flat, dtype=np.intp), np.array(offsets, dtype=np.intp), np.array(lengths, dtype=np.intp)
+
+    def cycles(self):
+        """Disjoint cycles of the permutation, fixed points omitted."""
+        flat, offsets, lengths = self._cycle_structure()
+        return [
+            tuple(flat[offset: offset + length].tolist())
+            for offset, length in zip(offsets.tolist(), lengths.tolist())
+            if length > 1
+        ]
+
+    def order(self):
+        _, _, lengths = self._cycle_structure()
+        return lcm(*np.unique(lengths).tolist())
+
+    def sign(self):
+        _, _, lengths = self._cycle_structure()
+        return -1 if (len(self) - len(lengths)) % 2 else 1
+
+    def __eq__(self, other):
+        return isinstance(other, Permutation) and np.array_equal(self.seq, other.seq)
+
+    def __hash__(self):
+        return hash(self.seq.tobytes())
 
     def __len__(self):
         return len(self.seq)
 
     def __repr__(self):
-        return f"Permutation({', '.join(str(i) for i in self.seq)})"
+        return f"Permutation({', '.join(str(i) for i in self.seq.tolist())})"
+
+
+def compose(p, q):
+    """Row-wise composition `p[i] * q[i]` of two batches of permutations (either may be a single row)."""
+    return np.take_along_axis(np.atleast_2d(p), np.atleast_2d(q), axis=1)
+
+
+class PermutationGroup:
+    """
+    The group generated by some permutations. A base and strong generating set are computed with the Schreier-Sims
+    algorithm; each base point gets a transversal stored as a 2D array so that sifting a batch of permutations is a
+    handful of fancy-indexing operations per base point.
+
+    `base` optionally fixes a prefix of the base.
+    """
+    def __init__(self, *generators, base=()):
+        if not generators:
+            raise ValueError("Need at least one generator.")
+
+        if any(len(generator) != len(generators[0]) for generator in generators):
+            raise ValueError("Length mismatch.")
+
+        self.degree = len(generators[0])
+        self.generators = np.array([generator.seq for generator in generators], dtype=np.intp)
+        self._schreier_sims(base)
+
+    def _transversal(self, point, gens):
+        """
+        Orbit of `point` under `gens`, a lookup from points to their index in the orbit (-1 if absent), and the
+        transversal elements (and their inverses) mapping `point` to each orbit point, one per row.
+        """
+        n = self.degree
+        where = np.full(n, -1, dtype=np.intp)
+        where[point] = 0
+
+        orbit = [np.array([point], dtype=np.intp)]
+        transversal = [np.arange(n, dtype=np.intp)[None]]
+        while True:
+            frontier, frontier_transversal = orbit[-1], transversal[-1]
+
+            images, first = np.unique(gens[:, frontier], return_index=True)
+            is_new = where[images] == -1
+            images, first = images[is_new], first[is_new]
+            if not len(images):
+                break
+
+            gen, parent = np.divmod(first, len(frontier))
+            where[images] = sum(map(len, orbit)) + np.arange(len(images))
+            orbit.append(images)
+            transversal.append(gens[gen[:, None], frontier_transversal[parent]])
+
+        orbit = np.concatenate(orbit)
+        transversal = np.concatenate(transversal)
+        inverse = np.empty_like(transversal)
+        inverse[np.arange(len(orbit))[:, None], transversal] = np.arange(n)
+        return orbit, where, transversal, inverse
+
+    def _sift(self, perms, start=0):
+        """
+        Sift a batch of permutations through the stabilizer chain from base point `start` on. Returns the residues and,
+        for each, the index of the base point where sifting failed (`len(self.base)` if it went all the way through).
+        """
+        perms = perms.copy()
+        levels = np.full(len(perms), len(self.base), dtype=np.intp)
+        active = np.arange(len(perms))
+
+        for level in range(start, len(self.base)):
+            _, where, _, inverse = self._levels[level]
+            rows = where[perms[active, self.base[level]]]
+
+            stuck = rows == -1
+            levels[active[stuck]] = level
+            active, rows = active[~stuck], rows[~stuck]
+
+            perms[active] = compose(inverse[rows], perms[active])
+
+        return perms, levels
+
+    def _schreier_sims(self, base):
+        identity = np.arange(self.degree)
+        gens = self.generators[(self.generators != identity).any(axis=1)]
+
+        self.base = list(base)
+        for gen in gens:
+            if (gen[self.base] == self.base).all():
+                self.base.append(int(np.flatnonzero(gen != identity)[0]))
+
+        self._strong = [gens[(gens[:, self.base[:i]] == self.base[:i]).all(axis=1)] for i in range(len(self.base))]
+        self._levels = [self._transversal(point, strong) for point, strong in zip(self.base, self._strong)]
+
+        i = len(self.base) - 1
+        while i >= 0:
+            _, where, transversal, inverse = self._levels[i]
+
+            # Every Schreier generator `u_{s(γ)}^-1 * s * u_γ` of the stabilizer of the first i + 1 base points, at
+            # once.
+            schreier = self._strong[i][:, transversal].reshape(-1, self.degree)
+            schreier = compose(inverse[where[schreier[:, self.base[i]]]], schreier)
+
+            residues, levels = self._sift(schreier, i + 1)
+            nontrivial = (levels < len(self.base)) | (residues != identity).any(axis=1)
+            if not nontrivial.any():
+                i -= 1
+                continue
+
+            first = np.argmax(nontrivial)
+            residue, j = residues[first], levels[first]
+            if j == len(self.base):
+                self.base.append(int(np.flatnonzero(residue != identity)[0]))
+                self._strong.append(np.empty((0, self.degree), dtype=np.intp))
+                self._levels.append(None)
+
+            for level in range(i + 1, j + 1):
+                self._strong[level] = np.vstack([self._strong[level], residue])
+                self._levels[level] = self._transversal(self.base[level], self._strong[level])
+            i = j
+
+    @property
+    def strong_generators(self):
+        """Strong generating set relative to `self.base`, one permutation per row."""
+        return np.unique(np.concatenate(self._strong), axis=0) if self._strong else self.generators[:0]
+
+    def order(self):
+        order = 1
+        for orbit, *_ in self._levels:
+            order *= len(orbit)
+        return order
+
+    def contains(self, perms):
+        """
+        Membership test for a `Permutation` or for a batch of permutations (a 2D array), in which case a boolean array
+        is returned.
+        """
+        if isinstance(perms, Permutation):
+            return bool(self.contains(perms.seq[None])[0])
+
+        perms = np.atleast_2d(perms)
+        if perms.shape[1] != self.degree:
+            raise ValueError("Length mismatch.")
+
+        residues, levels = self._sift(perms)
+        return (levels == len(self.base)) & (residues == np.arange(self.degree)).all(axis=1)
+
+    def __contains__(self, perm):
+        return isinstance(perm, Permutation) and len(perm) == self.degree and self.contains(perm)
+
+    def random(self, size=None, rng=None):
+        """
+        Uniformly random element of the group, or a batch of `size` of them as a 2D array. Each element is a product
+        of independently chosen transversal elements, one per base point.
+        """
+        rng = np.random.default_rng(rng)
+        perms = np.broadcast_to(np.arange(self.degree), (1 if size is None else size, self.degree))
+
+        for _, _, transversal, _ in reversed(self._levels):
+            perms = compose(transversal[rng.integers(len(transversal), size=len(perms))], perms)
+
+        return Permutation._from_array(perms[0].copy()) if size is None else perms
+
+    def orbit(self, point):
+        """Orbit of `point` under the group."""
+        orbit, *_ = self._transversal(point, self.generators)
+        return orbit
+
+    def stabilizer(self, point):
+        """The subgroup fixing `point`."""
+        group = self if self.base[:1] == [point] else PermutationGroup(*self._as_permutations(), base=(point,))
+
+        stabilizer = PermutationGroup.__new__(PermutationGroup)
+        stabilizer.degree = self.degree
+        stabilizer.base = group.base[1:]
+        stabilizer._strong = group._strong[1:]
+        stabilizer._levels = group._levels[1:]
+        # With no strong generators left (or none at this level) the stabilizer is trivial
+        trivial = not stabilizer._strong or not len(stabilizer._strong[0])
+        stabilizer.generators = np.arange(self.degree)[None] if trivial else stabilizer._strong[0]
+        return stabilizer
+
+    def _as_permutations(self):
+        return [Permutation._from_array(generator) for generator in self.generators]
+
+    def __repr__(self):
+        return f"PermutationGroup({', '.join(map(repr, self._as_permutations()))})"
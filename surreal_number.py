@@ -1,11 +1,20 @@
 """
 Two python implementations of a surreal number.  The first implementation tries to stick as close to the original
-definition as we can -- L and R are collections of numbers.  For the second we just use max(L) and min(R) when adding
-or multiplying to keep generated numbers a bit simpler.
+definition as we can -- L and R are collections of numbers.  The second only deals with numbers born on finite days,
+which are exactly the dyadic rationals, so it works with those directly and builds {L|R} forms only when asked.
+
+For `Number`s all the actual work happens on canonical forms: the simplest number between max(L) and min(R), which has
+at most one left and one right option.  Canonical forms are interned, so equal numbers share a single canonical object,
+and know the dyadic rational they equal, so comparisons are immediate and sums and products (memoized) are walks down
+the tree of forms.
 """
-from itertools import chain, product, starmap
-from operator import add, neg
-from functools import partial
+from itertools import product
+from functools import lru_cache
+from fractions import Fraction
+from math import ceil, floor
+from weakref import WeakValueDictionary
+
+CACHE_SIZE = 2**16
 
 
 def stringify(iterable):
@@ -17,17 +26,29 @@ def maybe_comma(iterable):
 
 class Number:
     """
-    Note we use tuples for L and R instead of sets since `Number`s aren't hashable. Even if we defined a __hash__ it
-    would do little to remove duplicate Numbers from the sets, so tuples it is.
+    Note we use tuples for L and R instead of sets since the options of a `Number` needn't be canonical. Numbers hash
+    and compare by their canonical form, but a set would still keep distinct forms of equal numbers, so tuples it is.
     """
     def __init__(self, L=(), R=(), *, name=None):
         self.L = tuple(sorted(L))
         self.R = tuple(sorted(R))
         self.name = name
+        self._canonical = None
 
         for l, r in product(self.L, self.R):
             assert l <= r
 
+    @property
+    def canonical(self):
+        """The simplest number strictly between max(L) and min(R)."""
+        if self._canonical is None:
+            lower = _max(l.canonical for l in self.L)
+            upper = _min(r.canonical for r in self.R)
+            if lower is not None and upper is not None and _le(upper, lower):
+                raise ValueError("Not a number.")
+            self._canonical = _simplest(lower, upper)
+        return self._canonical
+
     def __repr__(self):
         return f'Number(L=({stringify(self.L)}{maybe_comma(self.L)}), R=({stringify(self.R)}{maybe_comma(self.R)}))'
 
@@ -35,32 +56,25 @@ class Number:
         if self.name is not None: return self.name
         return f'{{{stringify(self.L)}|{stringify(self.R)}}}'
 
-    def __ge__(self, other):
-        return not (any(member <= other for member in self.R) or any(self <= member for member in other.L))
+    def __hash__(self): return id(self.canonical)
+
+    def __ge__(self, other): return _le(other.canonical, self.canonical)
 
     def __le__(self, other): return other >= self
 
-    def __eq__(self, other): return self >= other and other >= self
+    def __eq__(self, other): return isinstance(other, Number) and self.canonical is other.canonical
 
     def __gt__(self, other): return self >= other and not other >= self
 
     def __lt__(self, other): return other > self
 
-    def __add__(self, other):
-        left = chain(map(other.__add__, self.L), map(self.__add__, other.L))
-        right = chain(map(other.__add__, self.R), map(self.__add__, other.R))
-        return Number(left, right)
+    def __add__(self, other): return _add(self.canonical, other.canonical)
 
-    def __neg__(self): return Number(map(neg, self.R), map(neg, self.L))
+    def __neg__(self): return _neg(self.canonical)
 
     def __sub__(self, other): return self + (-other)
 
-    def __mul__(self, other):
-        def times(x, y): return x * other + self * y - x * y
-
-        left = chain(starmap(times, product(self.L, other.L)), starmap(times, product(self.R, other.R)))
-        right = chain(starmap(times, product(self.R, other.L)), starmap(times, product(self.L, other.R)))
-        return Number(left, right)
+    def __mul__(self, other): return _mul(self.canonical, other.canonical)
 
     def simplify(self):
         """Return the equivalent number with `L=max(self.L)` and `R=min(self.R).`"""
@@ -69,24 +83,134 @@ class Number:
         return Number(left, right, name=self.name)
 
 
-def comp(x, y):
-    if x is None: return y
-    if y is None: return x
-    return max(x, y)
+# Everything below works only with canonical forms, which are interned, so `is` is equality and they hash by identity.
+# Canonical forms are the nodes of the tree of numbers by birthday, so each is labelled with the dyadic rational its
+# path from 0 spells out (its sign expansion): comparing forms compares those, and sums and products, which agree with
+# the rationals', walk down the tree to the form of the result, one step per day, without recursing.
+_forms = WeakValueDictionary()
+
+def _form(left=None, right=None):
+    """The interned canonical `Number` with the (canonical) options `left` and `right`; None for no option."""
+    key = id(left), id(right)
+    number = _forms.get(key)
+    if number is None:
+        number = _forms[key] = Number.__new__(Number)
+        number.L = () if left is None else (left,)
+        number.R = () if right is None else (right,)
+        number.name = None
+        number._canonical = number
+        number._value = simplest_dyadic(None if left is None else left._value, None if right is None else right._value)
+    return number
+
+def _max(numbers):
+    return max(numbers, key=lambda number: number._value, default=None)
+
+def _min(numbers):
+    return min(numbers, key=lambda number: number._value, default=None)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _from_value(value):
+    """Walk down the tree of canonical forms from 0 to the one equal to the dyadic rational `value`."""
+    left = right = None
+    while (number := _form(left, right))._value != value:
+        if number._value < value:
+            left = number
+        else:
+            right = number
+    return number
+
+def _simplest(lower, upper):
+    """The first canonical form strictly between `lower` and `upper` on the way down from 0."""
+    lower = None if lower is None else lower._value
+    upper = None if upper is None else upper._value
+    return _from_value(simplest_dyadic(lower, upper))
+
+def _le(x, y):
+    return x._value <= y._value
+
+def _neg(x):
+    return _from_value(-x._value)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _add(x, y):
+    return _from_value(x._value + y._value)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _mul(x, y):
+    return _from_value(x._value * y._value)
+
+
+def simplest_dyadic(lower=None, upper=None):
+    """The earliest born (dyadic rational) number strictly between `lower` and `upper`; None is unbounded."""
+    if lower is not None and upper is not None and lower >= upper:
+        raise ValueError("Not a number.")
+
+    if (lower is None or lower < 0) and (upper is None or upper > 0):
+        return Fraction(0)
+
+    # Integers are born before everything else, the ones closest to 0 first.
+    if upper is None or lower is not None and lower >= 0:
+        integer = floor(lower) + 1
+        if upper is None or integer < upper: return Fraction(integer)
+    else:
+        integer = ceil(upper) - 1
+        if lower is None or integer > lower: return Fraction(integer)
+
+    # Otherwise exactly one multiple of 1/2**k fits for the smallest k that fits any.
+    denominator = 2
+    while (numerator := floor(lower * denominator) + 1) >= upper * denominator:
+        denominator *= 2
+    return Fraction(numerator, denominator)
 
 
 class FiniteNumber:
     """
-    `FiniteNumber`s only keep max(L) and min(R).  This should speed up the lot of combinatoric comparisons.
-    Unfortunately, this method ruins a bit of the original elegance since we need special checks if R is None or L is
-    None.
-
-    Even taking care to keep a single `FiniteNumber` in L and R, combinatorial explosion can still happen quite rapidly.
+    `FiniteNumber`s are normalized to the dyadic rational they're equal to, so comparing, adding and multiplying them is
+    just `Fraction` arithmetic.  L and R are the options a number was made with, or for the results of arithmetic, the
+    options of the number's canonical form, which are only built when asked for.
     """
     def __init__(self, L=None, R=None, name=None):
-        self.L = L
-        self.R = R
+        self.value = simplest_dyadic(None if L is None else L.value, None if R is None else R.value)
         self.name = name
+        self._options = L, R
+
+    @classmethod
+    def from_value(cls, value, name=None):
+        value = Fraction(value)
+        if value.denominator & (value.denominator - 1):
+            raise ValueError("Not a dyadic rational.")
+
+        number = cls.__new__(cls)
+        number.value = value
+        number.name = name
+        number._options = None
+        return number
+
+    def _canonical_options(self):
+        value = self.value
+        if value.denominator > 1:
+            step = Fraction(1, value.denominator)
+            return FiniteNumber.from_value(value - step), FiniteNumber.from_value(value + step)
+        if value > 0: return FiniteNumber.from_value(value - 1), None
+        if value < 0: return None, FiniteNumber.from_value(value + 1)
+        return None, None
+
+    @property
+    def L(self):
+        if self._options is None:
+            self._options = self._canonical_options()
+        return self._options[0]
+
+    @property
+    def R(self):
+        if self._options is None:
+            self._options = self._canonical_options()
+        return self._options[1]
+
+    @property
+    def birthday(self):
+        fractional_bits = self.value.denominator.bit_length() - 1
+        return floor(abs(self.value)) + (fractional_bits + 1 if fractional_bits else 0)
 
     def __repr__(self):
         return f'FiniteNumber(L={str(self.L) if self.L else ""}, R={str(self.R) if self.R else ""})'
@@ -95,42 +219,64 @@ class FiniteNumber:
         if self.name is not None: return self.name
         return f'{{{self.L if self.L else ""}|{self.R if self.R else ""}}}'
 
-    def __ge__(self, other):
-        return not (self.R and self.R <= other or other.L and self <= other.L)
+    def __hash__(self): return hash(self.value)
 
-    def __le__(self, other): return other >= self
+    def __ge__(self, other): return self.value >= other.value
 
-    def __eq__(self, other): return self >= other and other >= self
+    def __le__(self, other): return self.value <= other.value
 
-    def __gt__(self, other): return self >= other and not other >= self
+    def __eq__(self, other): return isinstance(other, FiniteNumber) and self.value == other.value
 
-    def __lt__(self, other): return other > self
+    def __gt__(self, other): return self.value > other.value
 
-    def __add__(self, other):
-        def add(x, y):
-            if x is None or y is None: return None
-            return x + y
+    def __lt__(self, other): return self.value < other.value
 
-        left = comp(add(other, self.L), add(self, other.L))
-        right = comp(add(other, self.R), add(self, other.R))
+    def __add__(self, other): return FiniteNumber.from_value(self.value + other.value)
 
-        return FiniteNumber(left, right)
+    def __neg__(self): return FiniteNumber.from_value(-self.value)
 
-    def __neg__(self): return FiniteNumber(None if self.R is None else -self.R, None if self.L is None else -self.L)
+    def __sub__(self, other): return FiniteNumber.from_value(self.value - other.value)
 
-    def __sub__(self, other): return self + (-other)
+    def __mul__(self, other): return FiniteNumber.from_value(self.value * other.value)
+
+
+_DAYS = []
 
-    def __mul__(self, other):
-        def times(x, y):
-            if x is None or y is None: return None
-            return x * other + self * y - x * y
+def born_by(n):
+    """
+    Yield, for each day up to day `n`, all `FiniteNumber`s born by that day in increasing order.  Days already seen are
+    kept in an index and reused.
+    """
+    if not _DAYS:
+        _DAYS.append((FiniteNumber.from_value(0),))
 
-        left = comp(times(self.L, other.L), times(self.R, other.R))
-        right = comp(times(self.R, other.L), times(self.L, other.R))
-        return FiniteNumber(left, right)
+    for day in range(n + 1):
+        if day == len(_DAYS):
+            # The numbers born on a day are the means of consecutive older numbers and one more past each end.
+            old = _DAYS[-1]
+            new = [FiniteNumber.from_value(old[0].value - 1)]
+            for a, b in zip(old, old[1:]):
+                new += a, FiniteNumber.from_value((a.value + b.value) / 2)
+            new += old[-1], FiniteNumber.from_value(old[-1].value + 1)
+            _DAYS.append(tuple(new))
+
+        yield _DAYS[day]
 
 
 if __name__ == '__main__':
+    zero = Number(name='0')
+    one = Number(L=(zero,), name='1')
+    half = Number(L=(zero,), R=(one,), name='1/2')
+    eight = one + one + one + one + one + one + one + one
+    sixteen = eight + eight
+    print('1/2 + 1/2 == 1:', half + half == one)
+    print('8 * 8 == 16 * 4:', eight * eight == sixteen * (one + one + one + one))
+    print('8 * 1/2 * 1/2 == 2:', eight * half * half == one + one)
+    twelve = eight + one + one + one + one
+    hundred = twelve * eight + one + one + one + one
+    print('12 * 12 == 16 * 9:', twelve * twelve == sixteen * (eight + one))
+    print('100 * 100 > 99 * 101:', hundred * hundred > (hundred - one) * (hundred + one))
+
     zero = FiniteNumber(name='0')
     one = FiniteNumber(L=zero, name='1')
     minus_one = FiniteNumber(R=zero, name='-1')
@@ -141,4 +287,7 @@ if __name__ == '__main__':
     print('0 * 1 == 0 * 2:', zero * one == zero * two)
     print('1 + -1 == 0:', one + minus_one == zero)
     print('2 * 3 == 3 + 3:', two * three == three + three)
-    print('3 + 3 > 3 + 2:', three + three > three + two)
\ No newline at end of file
+    print('3 + 3 > 3 + 2:', three + three > three + two)
+    million = FiniteNumber.from_value(10**6, name='1000000')
+    print('1000000 * 1000000 - 1 > 1000000 * 999999:', million * million - one > million * (million - one))
+    print('born by day 3:', ', '.join(str(number.value) for number in list(born_by(3))[-1]))
\ No newline at end of file
@@ -6,16 +6,48 @@ Example:
 In [159]: set(all_words_length(3))
 Out[159]: {((())), (()()), (())(), ()(()), ()()()}
 
-Unfortunately (())() is really the same as ()(()) so we're not quite there.
+Unfortunately (())() is really the same as ()(()) so we're not quite there.  See `canonical_words` below.
 """
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import combinations_with_replacement, groupby, islice
+from weakref import WeakValueDictionary
+
+import numpy as np
+
+PARENS = str.maketrans('10', '()')
+
+
 class Word:
-    def __init__(self, word1=None, word2=None, concat=True):
+    """
+    Words are stored as integers with '(' a 1 bit and ')' a 0 bit.  Every word starts with '(', so its length is just
+    the bit length; concatenating and nesting words are shifts and ors.  Words are interned by their bits.
+    """
+    __slots__ = 'bits', '__weakref__'
+
+    _interned = WeakValueDictionary()
+
+    def __new__(cls, word1=None, word2=None, concat=True):
         if word1 is None:
-            self.word = '()'
+            bits = 0b10
         elif concat:
-            self.word = f'{word1.word}{word2.word}'
+            bits = word1.bits << word2.bits.bit_length() | word2.bits
         else:
-            self.word = f'{word1.word[0]}{word2.word}{word1.word[1:]}'
+            rest = word1.bits.bit_length() - 1  # everything after word1's first '('
+            bits = (1 << word2.bits.bit_length() | word2.bits) << rest | word1.bits & ((1 << rest) - 1)
+        return cls._from_bits(bits)
+
+    @classmethod
+    def _from_bits(cls, bits):
+        word = cls._interned.get(bits)
+        if word is None:
+            word = cls._interned[bits] = object.__new__(cls)
+            word.bits = bits
+        return word
+
+    @property
+    def word(self):
+        return f'{self.bits:b}'.translate(PARENS)
 
     def __repr__(self):
         return self.word
@@ -27,10 +59,10 @@ class Word:
         return Word(self, other, concat=False)
 
     def __eq__(self, other):
-        return self.word == other.word
+        return self.bits == other.bits
 
     def __hash__(self):
-        return hash(self.word)
+        return hash(self.bits)
 
 
 def all_words_length(n):
@@ -42,8 +74,28 @@ def all_words_length(n):
         yield Word() + word
         yield word >> Word()
         yield Word() >> word
-"""
-We can improve using partitions though probably, a task for another day:
+
+
+def all_words_array(n):
+    """
+    The encoded bits of `all_words_length(n)`, in the same order, as a uint64 array (so n <= 32).  All these words have
+    length 2n, so each step of the grammar is a fixed shift of the whole array.
+    """
+    if not 1 <= n <= 32:
+        raise ValueError("n must be between 1 and 32.")
+
+    words = np.array([0b10], dtype=np.uint64)
+    for length in range(2, 2 * n, 2):
+        top = np.uint64(1 << length + 1)  # the first '(' of the new, longer words
+        words = np.stack((
+            words << np.uint64(2) | np.uint64(0b10),                                         # word + ()
+            top | words,                                                                     # () + word
+            top | np.uint64(0b10 << length - 1) | words & np.uint64((1 << length - 1) - 1),  # word >> ()
+            top | words << np.uint64(1),                                                     # () >> word
+        ), axis=1).ravel()
+    return words
+
+
 def partitions(n, m=None):
     if m is None or m >= n:
         yield [n]
@@ -54,7 +106,78 @@ def partitions(n, m=None):
     for m0 in range(start, 0, -1):
         for subpartition in partitions(n - m0, m0):
             yield [m0] + subpartition
+
+
 """
+We can do better using partitions: a set of n circles is a multiset of outermost circles, each containing a smaller set
+of circles.  For each partition of n into the sizes of those outermost circles, we choose a multiset of nested sets
+of each size.  Choosing multisets as sorted combinations gives a single canonical word for every set of circles:
+
+In [160]: [*canonical_words(3)]
+Out[160]: ['((()))', '(()())', '(())()', '()()()']
+
+In [161]: count(20), count(30)
+Out[161]: (35221832, 997171512998)
+"""
+BITS = str.maketrans('()', '10')
+MAX_CACHED = 10**5  # Nested sets of a size are cached if there are at most this many.
+
+@lru_cache(maxsize=None)
+def count(n):
+    """Number of sets of n non-intersecting circles, up to topological equivalence (rooted forests with n nodes)."""
+    if n == 0:
+        return 1
+
+    # Euler transform of the number of nested sets (rooted trees) of each size, count(size - 1).
+    weights = [sum(d * count(d - 1) for d in range(1, k + 1) if k % d == 0) for k in range(n + 1)]
+    return sum(weights[k] * count(n - k) for k in range(1, n + 1)) // n
+
+@lru_cache(maxsize=None)
+def _nested(size):
+    return tuple(_stream_nested(size))
+
+def _stream_nested(size):
+    for inner in canonical_words(size - 1):
+        yield f'({inner})'
+
+def _stream_multisets(size, k, start=0):
+    """Sorted multisets of k nested sets of a size, from the `start`-th on, streamed instead of cached."""
+    if k == 0:
+        yield ''
+        return
+
+    for i, word in enumerate(islice(_stream_nested(size), start, None), start):
+        for rest in _stream_multisets(size, k - 1, i):
+            yield word + rest
+
+def _choices(groups):
+    """For each (size, k) in groups, a sorted multiset of k nested sets of that size, all concatenated."""
+    if not groups:
+        yield ''
+        return
+
+    (size, k), *rest = groups
+    if count(size - 1) > MAX_CACHED:
+        choices = _stream_multisets(size, k)
+    else:
+        choices = map(''.join, combinations_with_replacement(_nested(size), k))
+    for choice in choices:
+        for tail in _choices(rest):
+            yield choice + tail
+
+def canonical_words(n, as_int=False):
+    """
+    Yield exactly one word per set of n non-intersecting circles. With `as_int`, words are encoded as integers with
+    '(' a 1 bit and ')' a 0 bit.
+    """
+    if n == 0:
+        yield 0 if as_int else ''
+        return
+
+    for partition in partitions(n):
+        groups = [(size, len(list(parts))) for size, parts in groupby(partition)]
+        for word in _choices(groups):
+            yield int(word.translate(BITS), 2) if as_int else word
 
 
 
@@ -62,7 +185,7 @@ def partitions(n, m=None):
 We can also try to generate topologically equivalent sets of intersecting circles, but we reach some
 limitations of our 1-d representation and we also once again produce some redundant sets:
 
-In [168]: [*possibles()]
+In [168]: [*possibles(3)]
 Out[168]:
 ['()[]{}',
  '()[{]}',
@@ -81,17 +204,122 @@ Out[168]:
  '([{}])']
 """
 
-required = {'[':'(', '{':'[', ')':'(', ']':'[', '}':'{'}
+PAIRS = '()', '[]', '{}', '<>', 'Aa', 'Bb', 'Cc', 'Dd', 'Ee', 'Ff', 'Gg', 'Hh'
 
-def possibles(current=('(',), brackets_left=(')', '[', ']', '{', '}')):
-    if not brackets_left:
-        yield ''.join(current)
-        return
+"""
+Symbols are numbered: circle i opens with 2 * i and closes with 2 * i + 1.  Circles are opened in order, so the set of
+circles opened so far is a count and the set of circles still open is a bitmask.
+
+Some sequences are redundant: a sequence splits into blocks wherever no circle is open, and the blocks can be freely
+reordered; and the whole sequence can be read backwards.  With `reduced=True` blocks must appear in sorted order --
+branches where a finished block is smaller than the one before it are pruned as soon as it closes -- and of a sequence
+and its mirror image only the smaller is kept:
+
+In [169]: [*possibles(3, reduced=True)]
+Out[169]:
+['()[]{}',
+ '()[{]}',
+ '()[{}]',
+ '([){]}',
+ '([){}]',
+ '([]{})',
+ '([{)]}',
+ '([{)}]',
+ '([{]})',
+ '([{})]',
+ '([{}])']
+
+In [170]: count_possibles(8)
+Out[170]: 932716
+"""
+
+def _relabel(block):
+    """Renumber the circles of a block so they start from 0."""
+    base = block[0]
+    return tuple(symbol - base for symbol in block)
+
+def _mirror(block):
+    """The block read backwards, circles renumbered in order of opening."""
+    circles = {}
+    mirrored = []
+    for symbol in reversed(block):
+        circle = symbol >> 1
+        if circle in circles:
+            mirrored.append(2 * circles[circle] + 1)
+        else:
+            mirrored.append(2 * len(circles))
+            circles[circle] = len(circles)
+    return tuple(mirrored)
+
+def _key(block):
+    return len(block), block
+
+def _children(k, state, reduced):
+    """States one symbol further along, in increasing order of the new symbol."""
+    word, opened, open_circles, start, blocks = state
+    children = []
+
+    circles = open_circles
+    while circles:
+        circle = (circles & -circles).bit_length() - 1
+        circles &= circles - 1
+
+        closed = open_circles & ~(1 << circle)
+        new_word = word + (2 * circle + 1,)
+        if reduced and not closed:  # A block just finished.
+            block = _relabel(new_word[start:])
+            if blocks and _key(block) < _key(blocks[-1]):
+                continue
+            children.append((new_word, opened, closed, len(new_word), blocks + (block,)))
+        else:
+            children.append((new_word, opened, closed, start, blocks))
+
+    if opened < k:
+        children.append((word + (2 * opened,), opened + 1, open_circles | 1 << opened, start, blocks))
+
+    return children
+
+def _start(k):
+    return ((0,), 1, 1, 0, ()) if k else ((), 0, 0, 0, ())
+
+def subtrees(k, depth, reduced=False):
+    """
+    Split the enumeration of `possibles(k, reduced=reduced)` into independent subtrees: all states `depth` symbols in
+    (and any finished earlier).  Each can be passed back to `possibles` as `state`.
+    """
+    stack = [_start(k)]
+    while stack:
+        state = stack.pop()
+        if len(state[0]) >= depth or len(state[0]) == 2 * k:
+            yield state
+        else:
+            stack.extend(reversed(_children(k, state, reduced)))
+
+def possibles(k=3, pairs=PAIRS, reduced=False, state=None):
+    """
+    Sequences of `k` possibly intersecting circles.  `pairs` are the brackets to use for each circle.  `state` restricts
+    the enumeration to one of the `subtrees`.
+    """
+    stack = [_start(k) if state is None else state]
+    while stack:
+        state = stack.pop()
+        word, *_, blocks = state
+
+        if len(word) < 2 * k:
+            stack.extend(reversed(_children(k, state, reduced)))
+        elif not reduced or tuple(map(_key, blocks)) <= tuple(sorted(_key(_mirror(block)) for block in blocks)):
+            yield ''.join(pairs[symbol >> 1][symbol & 1] for symbol in word)
+
+def _count_subtree(args):
+    k, reduced, state = args
+    return sum(1 for _ in possibles(k, reduced=reduced, state=state))
+
+def count_possibles(k, reduced=True, depth=6, processes=None):
+    """Count `possibles(k, reduced=reduced)`, with subtrees counted in parallel on `processes` processes."""
+    jobs = ((k, reduced, state) for state in subtrees(k, depth, reduced))
+    with ProcessPoolExecutor(processes) as executor:
+        return sum(executor.map(_count_subtree, jobs, chunksize=16))
 
-    for bracket in brackets_left:
-        if required[bracket] in current:
-            brackets = tuple(filter(bracket.__ne__, brackets_left))
-            yield from possibles(current + (bracket,), brackets)
 
 """
 Intersecting circles are similar to Venn diagrams, but venn diagrams can produce intersections that
@@ -101,13 +329,22 @@ A simple implementation of one-dimensional venn diagrams.
 
 Examples:
     In [220]: Venn('abcabc')
-    Out[220]: ∅, a&c&b, a&b, a, c, c&b
+    Out[220]: ∅, a, a&b, c, b&c, a&b&c
 
     In [221]: Venn('ab')
-    Out[221]: a&b, a
+    Out[221]: a, a&b
 
     In [222]: Venn('abac')
-    Out[222]: a&b, a, b, c&b
+    Out[222]: a, b, a&b, b&c
+
+    In [223]: venn_regions(['abcabc', 'ab', 'abac'])
+    Out[223]:
+    (('a', 'b', 'c'),
+     [array([0, 1, 3, 4, 6, 7], dtype=uint64),
+      array([1, 3], dtype=uint64),
+      array([1, 2, 3, 6], dtype=uint64)])
+
+Regions are bitmasks, bit i set if the region is inside the i-th symbol.
 
 This works by incrementally removing a set if it exists else adding it:
     a b c a b c
@@ -138,17 +375,48 @@ This works by incrementally removing a set if it exists else adding it:
    |                  |
    +------------------+
 """
+def venn_regions(venns):
+    """
+    Regions of many one-dimensional venn diagrams at once.  Symbols are interned to bits in order of first appearance
+    across all of `venns`.  Returns the symbols and, for each venn diagram, a sorted array of its regions as bitmasks.
+    """
+    if not venns:
+        return (), []
+
+    codes = np.frombuffer(''.join(venns).encode('utf-32-le'), dtype=np.uint32)
+    unique, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    if len(unique) > 64:
+        raise ValueError("At most 64 distinct symbols.")
+
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    symbols = tuple(map(chr, unique[order].tolist()))
+
+    lengths = np.array([len(venn) for venn in venns], dtype=np.intp)
+    valid = np.arange(lengths.max(initial=0)) < lengths[:, None]
+    bits = np.zeros(valid.shape, dtype=np.uint64)
+    bits[valid] = np.uint64(1) << rank[inverse].astype(np.uint64)
+
+    # Each prefix toggles its last symbol, so regions are the running xor of the symbol bits.
+    regions = np.bitwise_xor.accumulate(bits, axis=1)[valid]
+    rows = np.repeat(np.arange(len(venns)), lengths)
+
+    order = np.lexsort((regions, rows))
+    regions, rows = regions[order], rows[order]
+    distinct = np.ones(len(regions), dtype=bool)
+    distinct[1:] = (regions[1:] != regions[:-1]) | (rows[1:] != rows[:-1])
+
+    regions, rows = regions[distinct], rows[distinct]
+    return symbols, np.split(regions, np.searchsorted(rows, np.arange(1, len(venns))))
+
+
 class Venn:
     def __init__(self, venn):
-        self.__make__(venn)
-
-    def __make__(self, venn):
-        relations = set()
-        s = set()
-        for symbol in venn:
-             (set.remove if symbol in s else set.add)(s, symbol)
-             relations.add("&".join(s) if s else "∅")
-        self.__rep__ = ", ".join(relations)
+        self.symbols, (self.regions,) = venn_regions([venn])
 
     def __repr__(self):
-        return self.__rep__
+        return ", ".join(
+            "&".join(symbol for i, symbol in enumerate(self.symbols) if region >> i & 1) or "∅"
+            for region in self.regions.tolist()
+        )
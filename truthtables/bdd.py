@@ -0,0 +1,225 @@
+"""
+Reduced ordered binary decision diagrams.
+
+Example usage:
+In [1]: bdd = BDD('pqr')
+
+In [2]: u = bdd.build(parse('p and (~q or (p and r))')[0])
+
+In [3]: bdd.build(parse('~(~p or q and ~r)')[0]) == u
+Out[3]: True
+
+In [4]: bdd.count(u), bdd.is_tautology(u), bdd.is_satisfiable(u)
+Out[4]: (3, False, True)
+
+Nodes are integers: 0 and 1 are the FALSE and TRUE terminals.  Every other node tests a variable and has a low (variable
+false) and high (variable true) child.  A unique table guarantees there's only one node for each (variable, low, high),
+so equivalent formulas built in the same `BDD` are the very same node.
+"""
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from .expressions import BinOp, Const, UnOp, Var
+
+FALSE, TRUE = 0, 1
+
+
+def order_variables(exprs, heuristic='appearance'):
+    """
+    Variable order for a BDD of `exprs`:
+        'appearance' -- order of first appearance, depth-first and left to right, which keeps variables that are
+                        combined with each other close together;
+        'frequency'  -- most often used first;
+        'alphabetical'.
+    """
+    seen = Counter()
+
+    def walk(expr):
+        if isinstance(expr, Var):
+            seen[expr.name] += 1
+        elif isinstance(expr, UnOp):
+            walk(expr.expr)
+        elif isinstance(expr, BinOp):
+            walk(expr.l)
+            walk(expr.r)
+
+    for expr in exprs:
+        walk(expr)
+
+    if heuristic == 'appearance':
+        return list(seen)
+    if heuristic == 'frequency':
+        return [name for name, _ in seen.most_common()]
+    if heuristic == 'alphabetical':
+        return sorted(seen)
+    raise ValueError(f"Unknown heuristic {heuristic!r}.")
+
+
+class BDD:
+    """
+    A manager for BDDs over `variables`, in that order.  Results of operations are kept in a computed table of at most
+    `cache_size` entries, least recently used evicted first.
+    """
+    def __init__(self, variables, cache_size=2**18):
+        self.variables = list(variables)
+        self.index = {name: i for i, name in enumerate(self.variables)}
+
+        # Terminals test a variable past the last one.
+        n = len(self.variables)
+        self.var, self.low, self.high = [n, n], [FALSE, TRUE], [FALSE, TRUE]
+        self._unique = {}
+
+        self.cache_size = cache_size
+        self._computed = OrderedDict()
+
+    def node(self, var, low, high):
+        if low == high:
+            return low
+
+        key = var, low, high
+        node = self._unique.get(key)
+        if node is None:
+            node = self._unique[key] = len(self.var)
+            self.var.append(var)
+            self.low.append(low)
+            self.high.append(high)
+        return node
+
+    def variable(self, name):
+        return self.node(self.index[name], FALSE, TRUE)
+
+    def _cached(self, key):
+        result = self._computed.get(key)
+        if result is not None:
+            self._computed.move_to_end(key)
+        return result
+
+    def _cache(self, key, result):
+        self._computed[key] = result
+        if len(self._computed) > self.cache_size:
+            self._computed.popitem(last=False)
+
+    def _cofactors(self, u, var):
+        return (self.low[u], self.high[u]) if self.var[u] == var else (u, u)
+
+    def apply(self, op, func, u, v):
+        """Combine two nodes with a binary operator; `op` is its symbol and `func` its function on bools."""
+        if u <= TRUE and v <= TRUE:
+            return int(func(bool(u), bool(v)))
+
+        key = op, u, v
+        result = self._cached(key)
+        if result is None:
+            var = min(self.var[u], self.var[v])
+            (u0, u1), (v0, v1) = self._cofactors(u, var), self._cofactors(v, var)
+            result = self.node(var, self.apply(op, func, u0, v0), self.apply(op, func, u1, v1))
+            self._cache(key, result)
+        return result
+
+    def apply_unary(self, op, func, u):
+        if u <= TRUE:
+            return int(func(bool(u)))
+
+        key = op, u
+        result = self._cached(key)
+        if result is None:
+            low, high = self.apply_unary(op, func, self.low[u]), self.apply_unary(op, func, self.high[u])
+            result = self.node(self.var[u], low, high)
+            self._cache(key, result)
+        return result
+
+    def from_column(self, column, packed=False):
+        """
+        Node of the function with truth table `column` (boolean, or a packed bitset if `packed`), whose k-th variable
+        is this manager's k-th variable.  Built a level at a time from the bottom up: the nodes of each level are the
+        distinct (low, high) pairs of the level below.
+        """
+        n = len(self.variables)
+        if packed and n >= 6:
+            # The last six variables are resolved within each word.
+            words, inverse = np.unique(column, return_inverse=True)
+            memo = {}
+            nodes = np.array([self._from_bits(int(word), 64, n - 6, memo) for word in words.tolist()])[inverse]
+            level = n - 6
+        else:
+            nodes = np.unpackbits(
+                np.asarray(column).astype('<u8').view(np.uint8), count=2**n, bitorder='little'
+            ) if packed else np.asarray(column)
+            nodes = nodes.astype(np.intp)
+            level = n
+
+        for var in reversed(range(level)):
+            pairs, inverse = np.unique(nodes.reshape(-1, 2), axis=0, return_inverse=True)
+            nodes = np.array([self.node(var, low, high) for low, high in pairs.tolist()])[inverse.ravel()]
+        return int(nodes[0])
+
+    def _from_bits(self, bits, width, var, memo):
+        if width == 1:
+            return bits & 1
+
+        key = bits, width
+        if key not in memo:
+            half = width // 2
+            low = self._from_bits(bits & (1 << half) - 1, half, var + 1, memo)
+            high = self._from_bits(bits >> half, half, var + 1, memo)
+            memo[key] = self.node(var, low, high)
+        return memo[key]
+
+    def build(self, expr):
+        if isinstance(expr, Var):
+            return self.variable(expr.name)
+        if isinstance(expr, Const):
+            return int(expr.value)
+        if isinstance(expr, UnOp):
+            return self.apply_unary(expr.op, expr.func, self.build(expr.expr))
+        return self.apply(expr.op, expr.func, self.build(expr.l), self.build(expr.r))
+
+    def is_tautology(self, u):
+        return u == TRUE
+
+    def is_satisfiable(self, u):
+        return u != FALSE
+
+    def count(self, u):
+        """Number of assignments of all the variables that satisfy u."""
+        counts = {FALSE: 0, TRUE: 1}  # satisfying assignments of the variables from a node's variable on
+
+        def count(u):
+            if u not in counts:
+                low, high, var = self.low[u], self.high[u], self.var[u]
+                counts[u] = (count(low) << self.var[low] - var - 1) + (count(high) << self.var[high] - var - 1)
+            return counts[u]
+
+        return count(u) << self.var[u]
+
+    def cubes(self, u):
+        """
+        Yield a cube for each path from u to TRUE, as a pair of bitsets (value, mask): the i-th variable is bit
+        n - 1 - i, set in the mask if the path doesn't test it.  The cubes are disjoint and together cover u.
+        """
+        n = len(self.variables)
+        stack = [(u, 0, (1 << n) - 1)]
+        while stack:
+            u, value, mask = stack.pop()
+            if u == TRUE:
+                yield value, mask
+            elif u != FALSE:
+                bit = 1 << n - 1 - self.var[u]
+                stack.append((self.high[u], value | bit, mask & ~bit))
+                stack.append((self.low[u], value, mask & ~bit))
+
+    def evaluate(self, u, assignments):
+        """
+        Value of u for each row of `assignments`, a boolean array with a column for each variable in this manager's
+        order.  All rows walk down the diagram together, one variable per step.
+        """
+        var, low, high = (np.array(nodes) for nodes in (self.var, self.low, self.high))
+        nodes = np.full(len(assignments), u)
+        rows = np.arange(len(assignments))
+
+        while len(rows := rows[nodes[rows] > TRUE]):
+            current = nodes[rows]
+            nodes[rows] = np.where(assignments[rows, var[current]], high[current], low[current])
+
+        return nodes == TRUE
@@ -0,0 +1,134 @@
+"""
+Compile expression trees into straight-line programs that evaluate every row of a truth table at once.
+
+Example usage:
+In [1]: program = Program(parse('p and q or r')[0], parse('~(p and q)')[0])
+
+In [2]: program
+Out[2]:
+r0 = p
+r1 = q
+r2 = r0 and r1
+r3 = r
+r4 = r2 or r3
+r5 = ~r2
+
+In [3]: program.run(['p', 'q', 'r'])
+Out[3]:
+[array([False,  True, False,  True, False,  True,  True,  True]),
+ array([ True,  True,  True,  True,  True,  True, False, False])]
+
+Rows are ordered as in `itertools.product((False, True), repeat=n)`, so the k-th of n variables is true in the rows
+where bit n - 1 - k of the row index is set.  Columns are either boolean arrays or bitsets packed 64 rows to a uint64
+word, row r in bit r % 64 of word r // 64.
+"""
+import numpy as np
+
+ALL = np.uint64(2**64 - 1)
+# Packed columns of the variables whose bit in the row index is less than 6 repeat within each word.
+PATTERNS = tuple(np.uint64(sum(1 << row for row in range(64) if row >> bit & 1)) for bit in range(6))
+COMMUTATIVE = {'and', 'or', 'xor', '<->'}
+
+
+def n_words(n_rows):
+    return -(-n_rows // 64)
+
+
+def trim(column, n):
+    """Clear the unused bits of a packed column of a table with n < 6 variables (fewer than 64 rows)."""
+    return column & np.uint64(2**2**n - 1) if n < 6 else column
+
+
+def variable_column(k, n, packed=False):
+    """Column of the k-th of n variables."""
+    bit = n - 1 - k
+    if not packed:
+        return np.tile(np.repeat([False, True], 2**bit), 2**k)
+
+    if bit < 6:
+        return trim(np.full(n_words(2**n), PATTERNS[bit]), n)
+    return np.tile(np.repeat([np.uint64(0), ALL], 2**(bit - 6)), 2**k)
+
+
+def const_column(value, n, packed=False):
+    if not packed:
+        return np.full(2**n, value)
+    return trim(np.full(n_words(2**n), ALL if value else np.uint64(0)), n)
+
+
+def unpack(column, n_rows):
+    """Boolean array of the first `n_rows` rows of a packed column."""
+    return np.unpackbits(column.astype('<u8').view(np.uint8), count=n_rows, bitorder='little').astype(bool)
+
+
+class Program:
+    """
+    A list of instructions, each writing the next register.  Identical subexpressions of all the compiled expressions
+    share a single register, so they're only evaluated once.
+    """
+    def __init__(self, *exprs):
+        self.instructions = []
+        self._registers = {}
+        self.outputs = [expr.compile(self) for expr in exprs]
+
+    def _register(self, key, instruction):
+        register = self._registers.get(key)
+        if register is None:
+            register = self._registers[key] = len(self.instructions)
+            self.instructions.append(instruction)
+        return register
+
+    def var(self, name):
+        return self._register(('var', name), ('var', name))
+
+    def const(self, value):
+        return self._register(('const', value), ('const', value))
+
+    def op(self, op, ufunc, *args):
+        key = (op, *sorted(args)) if op in COMMUTATIVE else (op, *args)
+        return self._register(key, (op, ufunc, *args))
+
+    def __repr__(self):
+        lines = []
+        for i, (op, *args) in enumerate(self.instructions):
+            if op in ('var', 'const'):
+                expr = str(args[0])
+            elif len(args) == 2:
+                expr = f'{op}r{args[1]}'
+            else:
+                expr = f'r{args[1]} {op} r{args[2]}'
+            lines.append(f'r{i} = {expr}')
+        return '\n'.join(lines)
+
+    def run(self, variables, packed=False):
+        """
+        Evaluate the program over all 2**len(variables) rows.  Returns a column for each compiled expression.
+        """
+        n = len(variables)
+        index = {name: k for k, name in enumerate(variables)}
+
+        # Drop each register after its last use so only live columns are kept around.
+        last_use = {}
+        for i, (op, *args) in enumerate(self.instructions):
+            if op not in ('var', 'const'):
+                for register in args[1:]:
+                    last_use[register] = i
+        for register in self.outputs:
+            last_use[register] = len(self.instructions)
+
+        registers = []
+        for i, (op, *args) in enumerate(self.instructions):
+            if op == 'var':
+                registers.append(variable_column(index[args[0]], n, packed))
+            elif op == 'const':
+                registers.append(const_column(args[0], n, packed))
+            else:
+                ufunc, *operands = args
+                registers.append(ufunc(*(registers[register] for register in operands)))
+                for register in operands:
+                    if last_use[register] == i:
+                        registers[register] = None
+
+        if packed:
+            return [trim(registers[register], n) for register in self.outputs]
+        return [registers[register] for register in self.outputs]
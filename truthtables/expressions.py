@@ -1,3 +1,12 @@
+"""
+Expression trees for boolean formulas.
+
+Besides evaluating a single row with `expr(**var_values)`, trees compile into a `truthtables.compiler.Program` that
+evaluates every row at once; each operator has a `ufunc` that works on boolean arrays and on bitsets packed in uint64s.
+"""
+import numpy as np
+
+
 class Expr:
     pass
 
@@ -22,6 +31,9 @@ class UnOp(Op):
     def __call__(self, **var_values):
         return self.func(self.expr(**var_values))
 
+    def compile(self, program):
+        return program.op(self.op, self.ufunc, self.expr.compile(program))
+
 
 class BinOp(Op):
     """Binary Operator"""
@@ -38,6 +50,9 @@ class BinOp(Op):
     def __call__(self, **var_values):
         return self.func(self.l(**var_values), self.r(**var_values))
 
+    def compile(self, program):
+        return program.op(self.op, self.ufunc, self.l.compile(program), self.r.compile(program))
+
 
 class Var(Expr):
     def __init__(self, name):
@@ -49,6 +64,9 @@ class Var(Expr):
     def __call__(self, **var_values):
         return var_values[self.name]
 
+    def compile(self, program):
+        return program.var(self.name)
+
 
 class Const(Expr):
     def __init__(self, value):
@@ -60,6 +78,9 @@ class Const(Expr):
     def __call__(self, **var_values):
         return self.value
 
+    def compile(self, program):
+        return program.const(self.value)
+
 
 class TRUE(Const):
     def __init__(self):
@@ -78,30 +99,42 @@ class FALSE(Const):
 
 
 class Negate(UnOp):
+    ufunc = staticmethod(np.invert)
+
     def __init__(self, p):
         super().__init__('~', lambda p:not p, p)
 
 
 class And(BinOp):
+    ufunc = staticmethod(np.bitwise_and)
+
     def __init__(self, p, q):
         super().__init__('and', lambda p, q:p and q, p, q)
 
 
 class Or(BinOp):
+    ufunc = staticmethod(np.bitwise_or)
+
     def __init__(self, p, q):
         super().__init__('or', lambda p, q:p or q, p, q)
 
 
 class Implies(BinOp):
+    ufunc = staticmethod(lambda p, q: ~p | q)
+
     def __init__(self, p, q):
         super().__init__('->', lambda p, q:not p or q, p, q)
 
 
 class Iff(BinOp):
+    ufunc = staticmethod(lambda p, q: ~(p ^ q))
+
     def __init__(self, p, q):
         super().__init__('<->', lambda p, q:p == q, p, q)
 
 
 class Xor(BinOp):
+    ufunc = staticmethod(np.bitwise_xor)
+
     def __init__(self, p, q):
         super().__init__('xor', lambda p, q:p != q, p, q)
@@ -0,0 +1,492 @@
+"""
+Two-level minimization: minimal sum-of-products (DNF) and product-of-sums (CNF) formulas of truth table columns or BDDs.
+
+Example usage:
+In [1]: tt = TruthTable('(p and q) or (p and ~q and r) or (~p and q and r)', 'p xor q')
+
+In [2]: tt.minimize()
+Out[2]: [((p and q) or (p and r)) or (q and r), (p and ~q) or (~p and q)]
+
+In [3]: tt.minimize('cnf')
+Out[3]: [((p or q) and (p or r)) and (q or r), (p or q) and (~p or ~q)]
+
+Cubes are pairs of bitsets (value, mask) over n variables, the k-th variable being bit n - 1 - k (the same bit as in
+the row index of a truth table).  A variable whose bit is set in the mask is absent from the cube; otherwise the cube
+has the literal `x` if its bit is set in the value, `~x` if not.
+
+Functions of at most `MAX_EXACT_VARS` variables are minimized exactly: every prime implicant is generated
+(Quine-McCluskey, with implicants merged as bitsets) and a cheapest cover is found by branch and bound.  Larger
+functions, functions with too many prime implicants, and cover searches that run out of branches fall back on a
+heuristic, Espresso-style minimization starting from the disjoint cubes of the function's BDD.  The cost of a cover is
+its number of cubes, then its number of literals.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from operator import not_
+
+import numpy as np
+
+from .bdd import BDD
+from .expressions import And, Or, Negate, Var, TRUE, FALSE
+from .parser_lexer import intern
+
+MAX_EXACT_VARS = 12
+MAX_EXACT_PRIMES = 2**10  # Functions with more prime implicants are minimized heuristically.
+MAX_BRANCHES = 2**10  # nodes of the cover search before settling for the best cover found so far
+PARALLEL_VARS = 10  # Smaller functions aren't worth splitting across processes.
+PARALLEL_SPLIT = 3  # prime implicant generation is split into 2**PARALLEL_SPLIT blocks
+
+
+_BYTE_COUNTS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1, dtype=np.intp)
+
+
+def _popcount(words):
+    """Set bits of each of `words` (uint64s), by a table of byte counts: np.bitwise_count needs NumPy 2."""
+    words = np.asarray(words, dtype=np.uint64)
+    flat = np.ascontiguousarray(words.reshape(-1))
+    return _BYTE_COUNTS[flat.view(np.uint8)].reshape(-1, 8).sum(axis=1).reshape(words.shape)
+
+
+def _bitset(column, n, packed):
+    """Rows of a column as a Python int, bit r set if row r is true."""
+    if packed:
+        data = np.asarray(column).astype('<u8').tobytes()
+    else:
+        data = np.packbits(np.asarray(column, dtype=bool), bitorder='little').tobytes()
+    return int.from_bytes(data, 'little') & (1 << 2**n) - 1
+
+
+def _indices(bits):
+    """Indices of the set bits of an int."""
+    data = np.frombuffer(bits.to_bytes(-(-bits.bit_length() // 8), 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(data, bitorder='little'))
+
+
+def _cost(cubes, n):
+    _, masks = cubes
+    return len(masks), int(n * len(masks) - _popcount(masks).sum())
+
+
+def _clear_patterns(n):
+    """clear[i]: the bitset of the rows of an n-variable table whose bit i is clear."""
+    clear = []
+    for i in range(n):
+        pattern, period = (1 << 2**i) - 1, 2**(i + 1)
+        while period < 2**n:
+            pattern |= pattern << period
+            period *= 2
+        clear.append(pattern)
+    return clear
+
+
+def _implicant_block(on, n, split, high):
+    """
+    Implicants of every mask whose top `split` bits are `high`, a bitset of their values for each mask in order.  The
+    implicants with mask m | b, for a bit b not in m, merge pairs of implicants with mask m whose values differ only in
+    b: `imp[m] & imp[m] >> b`, keeping the values with b clear.
+    """
+    clear = _clear_patterns(n)
+    width = n - split
+
+    first = on
+    for i in range(width, n):
+        if high >> i - width & 1 and first:
+            first &= first >> (1 << i) & clear[i]
+
+    block = [first] + [0] * (2**width - 1)
+    for low in range(1, 2**width):
+        bit = low & -low
+        if below := block[low ^ bit]:
+            block[low] = below & below >> bit & clear[bit.bit_length() - 1]
+    return block
+
+
+def _prime_block(n, split, high, blocks):
+    """
+    Prime implicants among the masks whose top `split` bits are `high`, given the implicant blocks of `high` and of
+    every `high` with one more bit set: an implicant is prime if it isn't part of any merge.
+    """
+    width = n - split
+    block = blocks[high]
+
+    values, masks = [], []
+    for low, implicant in enumerate(block):
+        if not implicant:
+            continue
+
+        mask = high << width | low
+        for i in range(n):
+            bit = 1 << i
+            if mask & bit:
+                continue
+            above = block[low | bit] if i < width else blocks[high | 1 << i - width][low]
+            if above:
+                implicant &= ~(above | above << bit)
+
+        if implicant:
+            found = _indices(implicant)
+            values.append(found)
+            masks.append(np.full(len(found), mask))
+    return values, masks
+
+
+def _parallel_blocks(on, n, split, processes):
+    """Prime implicants of every block of masks, blocks computed and searched in parallel."""
+    highs = range(2**split)
+    with ProcessPoolExecutor(processes) as executor:
+        blocks = list(executor.map(_implicant_block, *zip(*((on, n, split, high) for high in highs))))
+        jobs = [
+            (n, split, high, {other: blocks[other] for other in highs if other & high == high})
+            for high in highs
+        ]
+        return list(executor.map(_prime_block, *zip(*jobs)))
+
+
+def prime_implicants(on, n, processes=1):
+    """
+    Prime implicants of the function of n variables whose true rows are the set bits of the int `on`, as arrays of
+    values and masks.  The implicants with each mask are kept as a bitset of their values.  With more than one process,
+    masks are split by their top bits into blocks that are merged and searched for primes in parallel.
+    """
+    if processes == 1 or n < PARALLEL_VARS:
+        results = [_prime_block(n, 0, 0, {0: _implicant_block(on, n, 0, 0)})]
+    else:
+        results = _parallel_blocks(on, n, PARALLEL_SPLIT, processes)
+
+    values = [found for block_values, _ in results for found in block_values]
+    masks = [found for _, block_masks in results for found in block_masks]
+    if not values:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64)
+    return np.concatenate(values).astype(np.uint64), np.concatenate(masks).astype(np.uint64)
+
+
+def _covered_rows(values, masks, rows):
+    """Boolean matrix, one row per cube, of which of `rows` each cube covers."""
+    return (rows[None] ^ values[:, None]) & ~masks[:, None] == 0
+
+
+def _independent_rows(covers):
+    """
+    Size of a set of columns of `covers` no two of which share a row, found greedily: a lower bound on the number of
+    rows needed to cover every column.
+    """
+    free = np.ones(covers.shape[1], dtype=bool)
+    size = 0
+    for column in np.argsort(covers.sum(axis=0), kind='stable'):
+        if free[column]:
+            size += 1
+            free &= ~covers[covers[:, column]].any(axis=0)
+    return size
+
+
+def minimum_cover(covers, literals, max_branches=MAX_BRANCHES):
+    """
+    Indices of a cheapest set of rows of `covers` (implicants by minterms) covering every minterm; the cost of a set is
+    its size, then its total `literals`.  Branch and bound: branch on the implicants covering the minterm with fewest
+    of them (a single one for minterms of essential implicants), bounded below by `_independent_rows`.
+
+    The search is exponential in the number of implicants, so it gives up after `max_branches` nodes, returning the
+    best cover found so far (at worst a greedy one) and False for whether it's minimal.
+    """
+    # Start from a greedy cover.
+    best, remaining, ids = [], covers, np.arange(len(covers))
+    while remaining.shape[1]:
+        implicant = np.lexsort((literals[ids], -remaining.sum(axis=1)))[0]
+        best.append(int(ids[implicant]))
+        remaining = remaining[:, ~remaining[implicant]]
+    best_cost = len(best), int(literals[best].sum())
+    branches = 0
+
+    def search(chosen, cost, uncovered, ids):
+        """`ids`: the implicants that still cover some `uncovered` minterm."""
+        nonlocal best, best_cost, branches
+
+        remaining = covers[np.ix_(ids, uncovered)]
+        counts = remaining.sum(axis=0)
+        while len(counts) and counts.min() == 1:  # essential implicants don't need a branch
+            i = int(np.flatnonzero(remaining[:, np.argmin(counts)])[0])
+            chosen, cost = chosen + [int(ids[i])], cost + int(literals[ids[i]])
+            uncovered = uncovered & ~covers[ids[i]]
+            ids = ids[covers[np.ix_(ids, uncovered)].any(axis=1)]
+            remaining = covers[np.ix_(ids, uncovered)]
+            counts = remaining.sum(axis=0)
+
+        branches += 1
+        if branches > max_branches:
+            return
+
+        if not len(counts):
+            if (len(chosen), cost) < best_cost:
+                best, best_cost = chosen, (len(chosen), cost)
+            return
+
+        if (len(chosen) + _independent_rows(remaining), cost) >= best_cost:
+            return
+
+        candidates = np.flatnonzero(remaining[:, np.argmin(counts)])
+        order = np.lexsort((literals[ids[candidates]], -remaining[candidates].sum(axis=1)))
+        del remaining  # only the masks are kept down the recursion
+        for implicant in ids[candidates[order]].tolist():
+            left = uncovered & ~covers[implicant]
+            useful = covers[np.ix_(ids, left)].any(axis=1)
+            search(chosen + [implicant], cost + int(literals[implicant]), left, ids[useful])
+
+    search([], 0, np.ones(covers.shape[1], dtype=bool), np.arange(len(covers)))
+    return np.array(sorted(best), dtype=np.intp), branches <= max_branches
+
+
+def _column(on, n):
+    """Boolean column of the set bits of `on`."""
+    return np.unpackbits(
+        np.frombuffer(on.to_bytes(-(-2**n // 8), 'little'), dtype=np.uint8), count=2**n, bitorder='little'
+    ).astype(bool)
+
+
+def exact_cubes(on, n, processes=1):
+    """
+    Cubes of a minimal sum of products of the function of n variables whose true rows are the set bits of `on`.  With
+    more than `MAX_EXACT_PRIMES` prime implicants, or if the cover search runs out of branches, `heuristic_cubes` are
+    used instead when they're cheaper.
+    """
+    values, masks = prime_implicants(on, n, processes)
+    if not len(values):
+        return values, masks
+
+    manager = BDD(range(n))
+    heuristic = lambda: heuristic_cubes(manager, manager.from_column(_column(on, n)))
+    if len(values) > MAX_EXACT_PRIMES:
+        return heuristic()
+
+    covers = _covered_rows(values, masks, _indices(on).astype(np.uint64))
+    cover, minimal = minimum_cover(covers, n - _popcount(masks).astype(np.intp))
+    best = values[cover], masks[cover]
+    if minimal:
+        return best
+    return min(best, heuristic(), key=lambda cubes: _cost(cubes, n))
+
+
+def _contained(value, mask, values, masks):
+    """Which of the cubes `values, masks` lie inside the cube `value, mask`."""
+    return (masks & ~mask == 0) & ((values ^ value) & ~mask == 0)
+
+
+def _tautology(values, masks, full):
+    """Whether the cubes cover every row.  Splits on the variable that is a literal in the most cubes."""
+    if (masks == full).any():
+        return True
+    if sum(1 << count for count in _popcount(masks).tolist()) < 1 << int(_popcount(full)):
+        return False  # too few rows between them
+
+    bits = 1 << np.arange(int(full).bit_length(), dtype=np.uint64)
+    bit = bits[np.argmax((masks[:, None] & bits == 0).sum(axis=0))]
+    literal = masks & bit == 0
+    branches = [~literal | (values & bit == 0), ~literal | (values & bit != 0)]
+    branches.sort(key=np.count_nonzero)  # the smaller branch is more likely to fail
+    return all(_tautology(values[branch] & ~bit, masks[branch] | bit, full) for branch in branches)
+
+
+def _covers(values, masks, value, mask, full):
+    """Whether the cubes `values, masks` together cover the cube `value, mask`: their cofactor by it is a tautology."""
+    meets = (values ^ value) & ~(masks | mask) == 0
+    return _tautology(values[meets] & mask, masks[meets] | full & ~mask, full)
+
+
+def _hitting_set(conflicts, n):
+    """
+    Bits to keep so that every one of `conflicts` keeps a bit: the forced ones first, then greedily the bit in the most
+    conflicts left, then any that turn out to be redundant are dropped.
+    """
+    hits = (conflicts[:, None] >> np.arange(n, dtype=np.uint64) & np.uint64(1)).astype(bool)
+    keep = hits[hits.sum(axis=1) == 1].any(axis=0)
+
+    while not (hit := hits[:, keep].any(axis=1)).all():
+        keep[np.argmax(hits[~hit].sum(axis=0))] = True
+
+    for bit in np.flatnonzero(keep):
+        keep[bit] = False
+        if not hits[:, keep].any(axis=1).all():
+            keep[bit] = True
+
+    return np.uint64(sum(1 << bit for bit in np.flatnonzero(keep).tolist()))
+
+
+def _expand(values, masks, off_values, off_masks, n, full):
+    """
+    Make each cube as large as possible without meeting the OFF-set, biggest cubes first, and drop the cubes that end
+    up inside an expanded one.  The literals a cube keeps must separate it from every OFF cube.
+    """
+    values, masks = values.copy(), masks.copy()
+    dropped = np.zeros(len(values), dtype=bool)
+    for i in np.argsort(-_popcount(masks), kind='stable'):
+        if dropped[i]:
+            continue
+
+        conflicts = (values[i] ^ off_values) & ~(masks[i] | off_masks) & full
+        keep = _hitting_set(conflicts, n)
+        values[i] &= keep
+        masks[i] = full & ~keep
+
+        inside = _contained(values[i], masks[i], values, masks)
+        inside[i] = False
+        dropped |= inside
+
+    return values[~dropped], masks[~dropped]
+
+
+def _irredundant(values, masks, full):
+    """Drop cubes covered by the others, smallest first."""
+    keep = np.ones(len(values), dtype=bool)
+    for i in np.argsort(_popcount(masks), kind='stable'):
+        keep[i] = False
+        if not _covers(values[keep], masks[keep], values[i], masks[i], full):
+            keep[i] = True
+    return values[keep], masks[keep]
+
+
+def _reduce(values, masks, full):
+    """Shrink each cube, largest first, by dropping any half of it that the other cubes already cover."""
+    values, masks = values.copy(), masks.copy()
+    others = np.ones(len(values), dtype=bool)
+    for i in np.argsort(-_popcount(masks), kind='stable'):
+        others[i] = False
+        shrunk = True
+        while shrunk:
+            shrunk = False
+            for bit in 1 << _indices(int(masks[i])).astype(np.uint64):
+                for half in (values[i], values[i] | bit):
+                    if _covers(values[others], masks[others], half, masks[i] & ~bit, full):
+                        values[i] = half ^ bit
+                        masks[i] &= ~bit
+                        shrunk = True
+                        break
+        others[i] = True
+    return values, masks
+
+
+def espresso(values, masks, off_values, off_masks, n):
+    """
+    Heuristically minimal cover of the function whose ON-set is covered by the cubes `values, masks` and whose OFF-set
+    is covered by `off_values, off_masks`: expand and drop redundant cubes, then reduce, expand and drop redundant
+    cubes again for as long as the cost goes down.
+    """
+    full = np.uint64(2**n - 1)
+    best = _irredundant(*_expand(values, masks, off_values, off_masks, n, full), full)
+    while True:
+        cubes = _irredundant(*_expand(*_reduce(*best, full), off_values, off_masks, n, full), full)
+        if _cost(cubes, n) >= _cost(best, n):
+            return best
+        best = cubes
+
+
+def _bdd_cubes(manager, u):
+    cubes = np.array(list(manager.cubes(u)), dtype=np.uint64).reshape(-1, 2)
+    return cubes[:, 0], cubes[:, 1]
+
+
+def heuristic_cubes(manager, u):
+    """Cubes of a small sum of products of a BDD node, found with `espresso` from the paths of the node."""
+    off = _bdd_cubes(manager, manager.apply_unary('~', not_, u))
+    return espresso(*_bdd_cubes(manager, u), *off, len(manager.variables))
+
+
+def cubes(function, n=None, packed=False, complement=False, exact=None, processes=1):
+    """
+    Cubes of a minimal sum of products of `function` (or of its complement): a truth table column of n variables,
+    boolean or packed, or a `(manager, node)` pair of a BDD, whose variables are the manager's.  Exact for at most
+    `MAX_EXACT_VARS` variables unless `exact` says otherwise, prime implicants found on `processes` processes.
+    """
+    if isinstance(function, tuple):
+        manager, u = function
+        n = len(manager.variables)
+        if complement:
+            u = manager.apply_unary('~', not_, u)
+    else:
+        manager, u = None, None
+        if complement:
+            function = ~np.asarray(function)
+
+    if exact is None:
+        exact = n <= MAX_EXACT_VARS
+
+    if exact:
+        if manager is not None:
+            rows = (np.arange(2**n)[:, None] >> np.arange(n - 1, -1, -1) & 1).astype(bool)
+            function, packed = manager.evaluate(u, rows), False
+        return exact_cubes(_bitset(function, n, packed), n, processes)
+
+    if manager is None:
+        manager = BDD(range(n))
+        u = manager.from_column(function, packed)
+    return heuristic_cubes(manager, u)
+
+
+def _literal(name, positive):
+    var = intern(Var, name)
+    return var if positive else intern(Negate, var)
+
+
+def to_expr(values, masks, variables, form='dnf'):
+    """
+    Expression of cubes over `variables`: their sum of products for 'dnf'; for 'cnf', the product of sums of the
+    complement of the function they cover.
+    """
+    n = len(variables)
+    if form == 'dnf':
+        inner, outer, empty_term, empty = And, Or, TRUE, FALSE
+    elif form == 'cnf':
+        inner, outer, empty_term, empty = Or, And, FALSE, TRUE
+    else:
+        raise ValueError(f"Unknown form {form!r}.")
+
+    def key(cube):
+        value, mask = cube
+        return [(mask >> n - 1 - k & 1, (value >> n - 1 - k & 1) == (form == 'cnf')) for k in range(n)]
+
+    terms = []
+    for value, mask in sorted(zip(values.tolist(), masks.tolist()), key=key):
+        literals = [
+            _literal(name, bool(value >> n - 1 - k & 1) == (form == 'dnf'))
+            for k, name in enumerate(variables)
+            if not mask >> n - 1 - k & 1
+        ]
+        terms.append(_combine(inner, literals) if literals else intern(empty_term))
+
+    return _combine(outer, terms) if terms else intern(empty)
+
+
+def _combine(op, exprs):
+    """Balanced tree of `op`s joining `exprs` (pairwise, so its depth is logarithmic)."""
+    while len(exprs) > 1:
+        pairs = [intern(op, left, right) for left, right in zip(exprs[::2], exprs[1::2])]
+        exprs = pairs + exprs[len(pairs) * 2:]
+    return exprs[0]
+
+
+def minimize(function, variables, packed=False, form='dnf', exact=None, processes=1):
+    """
+    Minimal 'dnf' (sum of products) or 'cnf' (product of sums) expression of `function`, a truth table column of
+    `variables` or a `(manager, node)` pair of a BDD (in which case `variables` may be None).
+    """
+    if isinstance(function, tuple):
+        variables = function[0].variables
+    return to_expr(*cubes(function, len(variables), packed, form == 'cnf', exact, processes), variables, form)
+
+
+def _column_cubes(args):
+    return cubes(*args)
+
+
+def minimize_all(columns, variables, packed=False, form='dnf', exact=None, processes=None):
+    """
+    `minimize` each of `columns` on `processes` processes: several columns are minimized in parallel, a single column
+    has its prime implicants generated in parallel.  Functions of fewer than `PARALLEL_VARS` variables are minimized
+    serially.
+    """
+    if len(columns) == 1:
+        return [minimize(columns[0], variables, packed, form, exact, processes)]
+
+    jobs = [(column, len(variables), packed, form == 'cnf', exact) for column in columns]
+    if processes == 1 or len(variables) < PARALLEL_VARS or len(jobs) < 2:
+        return [to_expr(*result, variables, form) for result in map(_column_cubes, jobs)]
+
+    with ProcessPoolExecutor(processes) as executor:
+        return [to_expr(*result, variables, form) for result in executor.map(_column_cubes, jobs)]
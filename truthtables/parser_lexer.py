@@ -1,3 +1,13 @@
+"""
+Lexer and parser for boolean formulas.
+
+`parse` is the thread-safe way in: each thread gets its own lexer and parser, results are cached by formula text, and
+every node is interned, so equal subformulas of any formulas parsed are the same object.
+"""
+from functools import lru_cache
+from threading import Lock, local
+from weakref import WeakValueDictionary
+
 from sly import Lexer, Parser
 from .expressions import (
     Xor,
@@ -9,8 +19,26 @@ from .expressions import (
     TRUE as TRUE_,
     FALSE as FALSE_,
     Var,
+    UnOp,
+    BinOp,
 )
 
+_NODES = WeakValueDictionary()
+_NODES_LOCK = Lock()
+
+
+def intern(cls, *args):
+    """
+    The shared node `cls(*args)`.  Children are interned before their parents, so they're keyed by identity (they're
+    kept alive by their parents, so their ids can't be reused while the parent is interned).
+    """
+    key = cls, *(arg if isinstance(arg, str) else id(arg) for arg in args)
+    with _NODES_LOCK:
+        node = _NODES.get(key)
+        if node is None:
+            node = _NODES[key] = cls(*args)
+    return node
+
 
 class LogicLexer(Lexer):
     tokens = { XOR, OR, IFF, IMPLIES, AND, TRUE, FALSE, NAME }
@@ -25,17 +53,17 @@ class LogicLexer(Lexer):
 
     @_(r'T')
     def TRUE(self, t):
-        t.value = TRUE_
+        t.value = intern(TRUE_)
         return t
 
     @_(r'F')
     def FALSE(self, t):
-        t.value = FALSE_
+        t.value = intern(FALSE_)
         return t
 
-    @_(r'[a-z]')
+    @_(r'[a-z][0-9]*')
     def NAME(self, t):
-        t.value = Var(t.value)
+        t.value = intern(Var, t.value)
         return t
 
 
@@ -57,9 +85,6 @@ class LogicParser(Parser):
         'and': And
     }
 
-    def __init__(self):
-        self.vars = set()
-
     @_('expr')
     def statement(self, p):
         return p.expr
@@ -71,7 +96,7 @@ class LogicParser(Parser):
        'expr AND expr',
     )
     def expr(self, p):
-        return self.lookup[p[1]](p.expr0, p.expr1)
+        return intern(self.lookup[p[1]], p.expr0, p.expr1)
 
     @_('"(" expr ")"')
     def expr(self, p):
@@ -79,7 +104,7 @@ class LogicParser(Parser):
 
     @_('"~" expr')
     def expr(self, p):
-        return Negate(p.expr)
+        return intern(Negate, p.expr)
 
     @_('TRUE')
     def expr(self, p):
@@ -91,5 +116,41 @@ class LogicParser(Parser):
 
     @_('NAME')
     def expr(self, p):
-        self.vars.add(p.NAME.name)
         return p.NAME
+
+
+_LOCAL = local()
+
+
+def variables(expr):
+    """Names of the variables of an expression."""
+    names, seen, stack = set(), set(), [expr]
+    while stack:
+        expr = stack.pop()
+        if id(expr) in seen:  # subtrees are shared, only visit them once
+            continue
+        seen.add(id(expr))
+
+        if isinstance(expr, Var):
+            names.add(expr.name)
+        elif isinstance(expr, UnOp):
+            stack.append(expr.expr)
+        elif isinstance(expr, BinOp):
+            stack += expr.l, expr.r
+    return frozenset(names)
+
+
+@lru_cache(maxsize=2**12)
+def _parse(formula):
+    if not hasattr(_LOCAL, 'parser'):
+        _LOCAL.lexer, _LOCAL.parser = LogicLexer(), LogicParser()
+
+    expr = _LOCAL.parser.parse(_LOCAL.lexer.tokenize(formula))
+    if expr is None:  # raising keeps the failure out of the cache
+        raise SyntaxError(f"Invalid formula {formula!r}.")
+    return expr, variables(expr)
+
+
+def parse(formula):
+    """Parse tree of a formula and the set of its variables."""
+    return _parse(' '.join(formula.split()))
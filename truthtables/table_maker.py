@@ -1,20 +1,23 @@
-def table_maker(*rows):
-    """Generates an aligned table. Modified from https://github.com/salt-die/Table-Maker"""
-    rows = list(rows)
-
-    # Pad the length of items in each column
-    lengths = tuple(map(len, rows[0]))
-    for i, row in enumerate(rows):
-        for j, (item, length) in enumerate(zip(row, lengths)):
-            rows[i][j] = f'{item:^{length}}'
+def table_lines(header, rows):
+    """
+    Lines of an aligned table, one at a time.  Columns are as wide as the header, so `rows` can be any iterable of
+    rows and is only read as lines are needed.
+    """
+    lengths = tuple(map(len, header))
 
     # Make separators
     horizontals = tuple("─" * (length + 2) for length in lengths)
     top, title, bottom = (f'{l}{m.join(horizontals)}{r}' for l, m, r in ('┌┬┐', '├┼┤', '└┴┘'))
 
-    table = [f'│ {" │ ".join(row)} │' for row in rows]
-    table.insert(0, top)
-    table.insert(2, title)
-    table.append(bottom)
-    table = '\n'.join(table)
-    return table
\ No newline at end of file
+    yield top
+    yield f'│ {" │ ".join(header)} │'
+    yield title
+    for row in rows:
+        # Pad the length of items in each column
+        yield f'│ {" │ ".join(f"{item:^{length}}" for item, length in zip(row, lengths))} │'
+    yield bottom
+
+
+def table_maker(*rows):
+    """Generates an aligned table. Modified from https://github.com/salt-die/Table-Maker"""
+    return '\n'.join(table_lines(rows[0], rows[1:]))
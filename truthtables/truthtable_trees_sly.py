@@ -43,12 +43,45 @@ Out[110]: p
 
 Operator precedence is `~`, `()`, `and`, then left-to-right.
 """
-from itertools import product
-from .table_maker import table_maker
-from .parser_lexer import LogicLexer, LogicParser
+import csv
+from collections import OrderedDict
+from itertools import islice
+import numpy as np
+from .table_maker import table_lines
+from .parser_lexer import parse
+from .compiler import Program, n_words, variable_column
+from .bdd import BDD, order_variables
+from .minimize import minimize, minimize_all
 
-LEXER = LogicLexer()
-PARSER = LogicParser()
+CHUNK_SIZE = 2**12  # rows; a multiple of 64
+MAX_PACKED_VARS = 28  # Tables with more variables are generated from BDDs instead of being packed.
+
+class ColumnCache:
+    """Least recently used cache of arrays, bounded by their total size."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._arrays = OrderedDict()
+
+    def get(self, key):
+        array = self._arrays.get(key)
+        if array is not None:
+            self._arrays.move_to_end(key)
+        return array
+
+    def put(self, key, array):
+        if key in self._arrays:
+            return
+
+        self._arrays[key] = array
+        self.nbytes += array.nbytes
+        while self.nbytes > self.max_bytes:
+            _, old = self._arrays.popitem(last=False)
+            self.nbytes -= old.nbytes
+
+
+# Packed result columns keyed by prop and the variables of the table, shared by every table.
+COLUMNS = ColumnCache(max_bytes=2**28)
 
 
 class TruthTable:
@@ -65,38 +98,150 @@ class TruthTable:
         self._update_attributes()
 
     def add_prop(self, prop):
+        expr, variables = parse(prop)
         self._props.append(prop)
-        self._update_attributes()
+        self.exprs.append(expr)
+        self._prop_vars.append(variables)
+
+        if variables <= set(self.vars):
+            self._columns.append(None)
+            self._packed = self._bdd = None
+        else:
+            self._update_vars()
 
     def pop(self, i=None):
-        prop = self._props.pop() if i is None else self._props.pop(i)
-        self._update_attributes()
+        i = len(self._props) - 1 if i is None else i
+        prop = self._props.pop(i)
+        del self.exprs[i], self._prop_vars[i]
+
+        if sorted(frozenset().union(*self._prop_vars)) == self.vars:
+            del self._columns[i]
+            self._packed = self._bdd = None
+        else:
+            self._update_vars()
+
         return TruthTable(prop)
 
     def _update_attributes(self):
-        PARSER.vars = set()
-        self.exprs = [PARSER.parse(LEXER.tokenize(prop)) for prop in self.props]
-        self.vars = sorted(PARSER.vars)
-
-        self.table = []
-        for values in product((False, True), repeat=len(self.vars)):
-            vars_values = dict(zip(self.vars, values))
-            results = [expr(**vars_values) for expr in self.exprs]
-            self.table.append(list(values) + results)
-
-    def display(self, binary=False):
-        translate = '01' if binary else 'FT'
-        table = [[translate[i] for i in row] for row in self.table]
-        table = table_maker(self.vars + self.props, *table)
-        print(table)
+        self.exprs, self._prop_vars = map(list, zip(*map(parse, self._props))) if self._props else ([], [])
+        self._update_vars()
+
+    def _update_vars(self):
+        """The variables changed, so every column has to be expanded anew."""
+        self.vars = sorted(frozenset().union(*self._prop_vars))
+        self._columns = [None] * len(self._props)
+        self._packed = self._bdd = None
+
+    def _compute_columns(self):
+        """Fill in missing columns from the cache, evaluating any that aren't cached with a single program."""
+        variables = tuple(self.vars)
+        missing = []
+        for i, prop in enumerate(self._props):
+            if self._columns[i] is None:
+                self._columns[i] = COLUMNS.get((prop, variables))
+                if self._columns[i] is None:
+                    missing.append(i)
+
+        if missing:
+            columns = Program(*(self.exprs[i] for i in missing)).run(self.vars, packed=True)
+            for i, column in zip(missing, columns):
+                column.flags.writeable = False
+                self._columns[i] = column
+                COLUMNS.put((self._props[i], variables), column)
+
+    @property
+    def packed(self):
+        """
+        Results of the props, one row per prop, each packed 64 rows to a uint64 word.  Computed on first access; the
+        variable columns are never stored.
+        """
+        if self._packed is None:
+            self._compute_columns()
+            if self._columns:
+                self._packed = np.stack(self._columns)
+            else:
+                self._packed = np.empty((0, n_words(2**len(self.vars))), dtype=np.uint64)
+        return self._packed
+
+    @property
+    def bdd(self):
+        """A `BDD` with a node for each prop, built on first access."""
+        if self._bdd is None:
+            manager = BDD(order_variables(self.exprs))
+            self._bdd = manager, [manager.build(expr) for expr in self.exprs]
+        return self._bdd
+
+    def rows(self, chunk_size=CHUNK_SIZE):
+        """
+        Yield the table `chunk_size` rows at a time as boolean arrays, variable columns then prop columns.  Props are
+        read from the packed table, or for tables too large to pack, evaluated on the BDD a chunk at a time.
+        """
+        n = len(self.vars)
+        shifts = np.arange(n - 1, -1, -1)
+
+        for start in range(0, 2**n, chunk_size):
+            stop = min(start + chunk_size, 2**n)
+            variables = (np.arange(start, stop)[:, None] >> shifts & 1).astype(bool)
+
+            if n > MAX_PACKED_VARS:
+                manager, nodes = self.bdd
+                assignments = variables[:, [self.vars.index(name) for name in manager.variables]]
+                props = np.array([manager.evaluate(node, assignments) for node in nodes]).reshape(-1, stop - start)
+            else:
+                words = self.packed[:, start // 64: n_words(stop)].astype('<u8')
+                props = np.unpackbits(words.view(np.uint8), axis=1, count=stop - start, bitorder='little')
+
+            yield np.hstack((variables, props.T)).astype(bool)
+
+    def minimize(self, form='dnf', exact=None, processes=None):
+        """
+        Minimal 'dnf' (sum of products) or 'cnf' (product of sums) expression of each prop; see `truthtables.minimize`.
+        Packed columns are minimized in parallel on `processes` processes.
+        """
+        if len(self.vars) > MAX_PACKED_VARS:
+            manager, nodes = self.bdd
+            return [minimize((manager, node), None, form=form, exact=exact) for node in nodes]
+        return minimize_all(self.packed, self.vars, packed=True, form=form, exact=exact, processes=processes)
+
+    @property
+    def table(self):
+        return np.concatenate(list(self.rows())).tolist()
+
+    def _symbol_rows(self, binary, chunk_size):
+        translate = np.array(list('01' if binary else 'FT'))
+        for chunk in self.rows(chunk_size):
+            yield from translate[chunk.view(np.uint8)].tolist()
+
+    def display(self, binary=False, chunk_size=CHUNK_SIZE):
+        lines = table_lines(self.vars + self.props, self._symbol_rows(binary, chunk_size))
+        while chunk := list(islice(lines, chunk_size)):
+            print('\n'.join(chunk))
+
+    def write_csv(self, file, binary=False, chunk_size=CHUNK_SIZE):
+        """Write the table to an open text file as CSV, `chunk_size` rows at a time."""
+        writer = csv.writer(file)
+        writer.writerow(self.vars + self.props)
+        rows = self._symbol_rows(binary, chunk_size)
+        while chunk := list(islice(rows, chunk_size)):
+            writer.writerows(chunk)
+
+    def write_bytes(self, file):
+        """Write every column, variables then props, to an open binary file as little-endian packed uint64 words."""
+        n = len(self.vars)
+        for k in range(n):
+            file.write(variable_column(k, n, packed=True).astype('<u8').tobytes())
+        file.write(self.packed.astype('<u8').tobytes())
 
     def __repr__(self):
         return ' | '.join(self.props)
 
     def __eq__(self, other):
-        return (isinstance(other, TruthTable)
-                and self.vars == other.vars
-                and self.table == other.table)
+        if not (isinstance(other, TruthTable) and self.vars == other.vars and len(self.exprs) == len(other.exprs)):
+            return False
+
+        # Equivalent props are the same node of a shared BDD, so no rows need to be enumerated.
+        manager = BDD(order_variables(self.exprs + other.exprs))
+        return all(manager.build(p) == manager.build(q) for p, q in zip(self.exprs, other.exprs))
 
     def __add__(self, other):
         if isinstance(other, str):
@@ -107,5 +252,6 @@ class TruthTable:
         if isinstance(other, str):
             self.add_prop(other)
         else:
-            self.props = self.props + other.props
+            for prop in other.props:
+                self.add_prop(prop)
         return self